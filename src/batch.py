@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor
+from concurrent.futures import wait
+from typing import TextIO
+import maze
+import generators
+
+
+def generate(seed: int,
+             width: int,
+             height: int,
+             algorithm: str) -> dict:
+    """Carve a single maze from 'seed', and return it as a record ready
+    to be written out.
+
+    The maze gets a 'random.Random' of its own, seeded with 'seed', so
+    that it comes out the same no matter which worker carves it, or
+    what else that worker carved before.
+
+    """
+    grid = maze.Grid(width, height)
+    generators.GENERATORS[algorithm](grid, random.Random(seed))
+
+    return {
+        "seed": seed,
+        "algorithm": algorithm,
+        "width": width,
+        "height": height,
+        "perfect": grid.is_perfect(),
+        "cells": grid.cells.hex(),
+    }
+
+
+def generate_batch(seeds: range,
+                   width: int,
+                   height: int,
+                   algorithm: str,
+                   workers: int,
+                   out: TextIO) -> int:
+    """Carve one maze per seed across a pool of 'workers' processes,
+    writing each to 'out' as a line of JSON as soon as it's done.
+
+    Mazes are written in the order they finish, which isn't
+    necessarily the order of their seeds. Only a few mazes per worker
+    are queued up at a time, so memory doesn't grow with the number of
+    seeds.
+
+    Return the number of mazes that failed validation.
+
+    """
+    failures = 0
+
+    def write(future: Future) -> None:
+        nonlocal failures
+
+        record = future.result()
+
+        if not record["perfect"]:
+            failures += 1
+
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: set[Future] = set()
+
+        for seed in seeds:
+            if len(pending) >= 4 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    write(future)
+
+            pending.add(executor.submit(generate,
+                                        seed,
+                                        width,
+                                        height,
+                                        algorithm))
+
+        for future in wait(pending).done:
+            write(future)
+
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a batch of seeded mazes in parallel, one "
+        "line of JSON per maze.")
+    parser.add_argument("--seeds",
+                        nargs=2,
+                        type=int,
+                        default=[0, 100],
+                        metavar=("START", "STOP"),
+                        help="generate a maze for every seed in "
+                        "[START, STOP)")
+    parser.add_argument("--size",
+                        nargs=2,
+                        type=int,
+                        default=[10, 10],
+                        metavar=("WIDTH", "HEIGHT"),
+                        help="the size of each maze, in cells")
+    parser.add_argument("-a", "--algorithm",
+                        choices=generators.GENERATORS.keys(),
+                        default="hunt-and-kill")
+    parser.add_argument("-j", "--workers",
+                        default=None,
+                        type=int,
+                        help="the number of worker processes (default: "
+                        "one per CPU)")
+    parser.add_argument("-o", "--output",
+                        help="the file to write to (default: standard "
+                        "output)")
+    args = parser.parse_args()
+
+    width, height = args.size
+    workers = args.workers or os.process_cpu_count() or 1
+
+    # Standard output isn't ours to close.
+    if args.output is None:
+        out = contextlib.nullcontext(sys.stdout)
+    else:
+        out = open(args.output, "w")
+
+    with out as out:
+        failures = generate_batch(range(*args.seeds),
+                                  width,
+                                  height,
+                                  args.algorithm,
+                                  workers,
+                                  out)
+
+    if failures:
+        print(f"{failures} mazes failed validation", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,494 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from collections.abc import Callable
+import pygame
+import constants as cs
+import maze
+import generators
+
+
+def bench_carve(sizes: list[int], seed: int, algorithm: str) -> None:
+    """Time the given maze generator on square grids of the given side
+    lengths.
+
+    The time per cell is printed alongside the total, so that it's easy
+    to see whether carving scales linearly with the number of cells.
+
+    """
+    print(f"{'size':>11} {'cells':>9} {'seconds':>9} {'us/cell':>8}")
+
+    for size in sizes:
+        rng = random.Random(seed)
+        grid = maze.Grid(size, size)
+
+        start = time.perf_counter()
+        generators.GENERATORS[algorithm](grid, rng)
+        elapsed = time.perf_counter() - start
+
+        cells = size * size
+        label = f"{size}x{size}"
+
+        print(f"{label:>11} {cells:>9} {elapsed:>9.3f} "
+              f"{elapsed / cells * 1e6:>8.2f}")
+
+
+def _import_main():
+    """Import the game module, set up to create sprites without a
+    window."""
+
+    # The crawler sprites need a display to convert their images for.
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    import main
+    from spritesheet import Spritesheet
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    main.sheet = Spritesheet(f"{dir_path}/../graphics/spritesheet.png")
+
+    return main
+
+
+def _populate(main, side: int, count: int, seed: int) -> maze.Grid:
+    """Set up a level of 'side' by 'side' cells with 'count' crawlers
+    spread across its floor, and return its maze."""
+
+    random.seed(seed)
+    main.Moving.world.rng = main.np.random.default_rng(seed)
+
+    cs.configure_grid_size(side, side)
+
+    grid = maze.Grid(side, side)
+    generators.hunt_and_kill(grid, random.Random(seed))
+    tile_map = maze.rasterize(grid)
+
+    main.Crawler.group.empty()
+    main.Moving.world.reset()
+    main.Pillar.occupancy.reset(cs.NUM_TILES_X, cs.NUM_TILES_Y)
+    main.Pillar.occupancy.fill(tile_map)
+
+    floor = list(tile_map.positions(maze.Tile.FLOOR))
+
+    for x, y in random.sample(floor, count):
+        main.Crawler.spawn(x, y)
+
+    return grid
+
+
+def bench_crawlers(counts: list[int], ticks: int, seed: int) -> None:
+    """Time 'main.Crawler.update_all' with the given numbers of
+    crawlers.
+
+    Each population gets a level just big enough to hold it with
+    plenty of room to move, and is stepped with the same collision
+    setup as during play, at 60 ticks per second.
+
+    """
+    main = _import_main()
+
+    dt = 1 / 60
+    coltype = {
+        main.CollisionType.BLOCK: [main.Crawler.group,
+                                   main.Pillar.occupancy],
+        main.CollisionType.TAKE_DAMAGE: [main.Player.sword_group],
+    }
+
+    print(f"{'crawlers':>9} {'grid':>9} {'ms/tick':>8}")
+
+    for count in counts:
+        # A grid cell has at least four floor tiles, so this leaves
+        # most of the floor free.
+        side = max(10, math.ceil(math.sqrt(count)))
+        _populate(main, side, count, seed)
+
+        start = time.perf_counter()
+
+        for _ in range(ticks):
+            main.Crawler.update_all(dt, coltype)
+
+        elapsed = time.perf_counter() - start
+        label = f"{side}x{side}"
+
+        print(f"{count:>9} {label:>9} {elapsed / ticks * 1e3:>8.2f}")
+
+
+def bench_hunt(counts: list[int], ticks: int, seed: int, size: int) -> None:
+    """Time how crawlers find their way to the player, with the given
+    numbers of crawlers on a level of 'size' by 'size' cells.
+
+    Every tick, the player moves to the next cell of a row in the
+    middle of the level, so that the flow field is rebuilt every time.
+    The rebuild and the lookup of every crawler's direction are timed
+    separately; neither should grow much with the number of crawlers.
+
+    """
+    main = _import_main()
+    from pathfinding import FlowField
+
+    print(f"{'crawlers':>9} {'hunting':>8} {'field ms':>9} {'lookup ms':>10}")
+
+    for count in counts:
+        grid = _populate(main, size, count, seed)
+
+        field = FlowField(grid, main.Crawler.hunt_distance)
+        main.Crawler.field = field
+
+        crawlers = main.Moving.world.indices(main.Kind.CRAWLER)
+        target = pygame.Rect(0, 0, 1, 1)
+
+        field_time = 0.0
+        lookup_time = 0.0
+        hunting = 0
+
+        for tick in range(ticks):
+            x, y = tick % size, size // 2
+            target.center = cs.compute_pixel_coords(3 * x + 2, 3 * y + 2)
+
+            start = time.perf_counter()
+            field.update(x, y)
+            field_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            hunted, _ = main.Crawler.hunt(crawlers, target)
+            lookup_time += time.perf_counter() - start
+
+            hunting += hunted.sum()
+
+        print(f"{count:>9} {hunting // ticks:>8} "
+              f"{field_time / ticks * 1e3:>9.3f} "
+              f"{lookup_time / ticks * 1e3:>10.3f}")
+
+
+# The scenarios of the suite, as (kind, parameters). Densities are the
+# chance of a crawler starting out on each floor tile.
+SUITE = [
+    ("carve", {"size": 100}),
+    ("carve", {"size": 500}),
+    ("rasterize", {"size": 100}),
+    ("rasterize", {"size": 500}),
+    ("level", {"size": 100, "density": 0.05}),
+    ("level", {"size": 500, "density": 0.05}),
+    ("frames", {"size": 30, "density": 0.05}),
+    ("frames", {"size": 30, "density": 0.25}),
+    ("frames", {"size": 150, "density": 0.05}),
+    ("frames", {"size": 150, "density": 0.25}),
+]
+
+# The player's input during the 'frames' scenarios: a walk around the
+# start of the level, swinging the sword now and then.
+TOUR = "120 d\n120 s\n10 k\n120 a\n120 w\n10 k\n"
+
+
+def _carved(size: int, seed: int) -> maze.Grid:
+    grid = maze.Grid(size, size)
+    generators.hunt_and_kill(grid, random.Random(seed))
+
+    return grid
+
+
+def time_carve(size: int, seed: int) -> tuple[float, dict]:
+    grid = maze.Grid(size, size)
+
+    start = time.perf_counter()
+    generators.hunt_and_kill(grid, random.Random(seed))
+
+    return time.perf_counter() - start, {}
+
+
+def time_rasterize(size: int, seed: int) -> tuple[float, dict]:
+    grid = _carved(size, seed)
+
+    start = time.perf_counter()
+    maze.rasterize(grid)
+
+    return time.perf_counter() - start, {}
+
+
+def time_level(size: int, density: float, seed: int) -> tuple[float, dict]:
+    """Time building a level, from rasterizing its maze to spawning the
+    sprites around the player."""
+
+    main = _import_main()
+    cs.configure_grid_size(size, size)
+    main.Crawler.density = density
+
+    grid = _carved(size, seed)
+
+    start = time.perf_counter()
+    level = main.Level.from_strips(grid.strips(), seed)
+    elapsed = time.perf_counter() - start
+
+    crawlers = sum(len(records) for records in level.chunks.records.values())
+
+    return elapsed, {"crawlers": crawlers + len(level.crawlers)}
+
+
+def time_frames(size: int,
+                density: float,
+                seed: int,
+                frames: int) -> tuple[float, dict]:
+    """Time 'frames' headless frames of the game logic, per frame.
+
+    The player follows 'TOUR', and is put back at the start whenever it
+    dies, so that every run does the same work.
+
+    """
+    main = _import_main()
+    from controls import ScriptedControls
+
+    cs.configure_grid_size(size, size)
+    main.Crawler.density = density
+
+    grid = _carved(size, seed)
+
+    main.camera = main.Camera(*cs.compute_view_size())
+    # There's only the one level, so nothing is carved in the
+    # background.
+    main.dungeon = main.Dungeon(generators.carve_level, 1, seed)
+    main.dungeon.start(grid.strips())
+    main.camera.follow(main.Player.group.sprite.rect)
+
+    main.Player.controls = ScriptedControls(
+        TOUR * math.ceil(frames / 500))
+
+    deaths = 0
+    start = time.perf_counter()
+
+    for _ in range(frames):
+        if main.step(1 / 60) is not None:
+            deaths += 1
+
+            if main.Player.group.sprite is not None:
+                main.Player.kill(main.Player.group.sprite)
+
+            main.Player.group.add(main.Player(1, 1))
+
+    elapsed = time.perf_counter() - start
+    main.dungeon.close()
+
+    return elapsed / frames, {"crawlers": len(main.Crawler.group),
+                              "deaths": deaths}
+
+
+def _key(kind: str, params: dict) -> str:
+    """Name a scenario, e.g. 'frames[size=30,density=0.05]'."""
+
+    return f"{kind}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+
+
+def run_suite(kinds: list[str],
+              seed: int,
+              repeat: int,
+              frames: int) -> list[dict]:
+    """Run every scenario of 'SUITE' of the given kinds 'repeat' times,
+    and return the results.
+
+    Each result has the scenario's name, kind and parameters, the
+    fastest and the median time of its runs in seconds, and a tally of
+    the work done, which should be the same on every run with the same
+    seed.
+
+    """
+    timers: dict[str, Callable[..., tuple[float, dict]]] = {
+        "carve": time_carve,
+        "rasterize": time_rasterize,
+        "level": time_level,
+        "frames": lambda **params: time_frames(**params, frames=frames),
+    }
+
+    results = []
+
+    for kind, params in SUITE:
+        if kind not in kinds:
+            continue
+
+        times = []
+
+        for _ in range(repeat):
+            elapsed, work = timers[kind](**params, seed=seed)
+            times.append(elapsed)
+
+        results.append({"name": _key(kind, params),
+                        "kind": kind,
+                        "params": params,
+                        "min": min(times),
+                        "median": statistics.median(times),
+                        "work": work})
+
+        print(f"{results[-1]['name']:<36} {min(times) * 1e3:>10.3f} ms",
+              file=sys.stderr)
+
+    return results
+
+
+def compare(results: list[dict],
+            baseline: list[dict],
+            tolerance: float) -> int:
+    """Print how each result compares to the baseline result of the
+    same name, and return the number of regressions: results slower
+    than the baseline by more than 'tolerance', as a fraction.
+
+    The fastest runs are compared, since they're the least affected by
+    whatever else the machine is doing.
+
+    """
+    by_name = {result["name"]: result for result in baseline}
+    regressions = 0
+
+    print(f"{'scenario':<36} {'baseline':>10} {'now':>10} {'change':>8}")
+
+    for result in results:
+        old = by_name.get(result["name"])
+
+        if old is None:
+            print(f"{result['name']:<36} {'-':>10} "
+                  f"{result['min'] * 1e3:>10.3f}")
+            continue
+
+        change = result["min"] / old["min"] - 1
+        verdict = ""
+
+        if change > tolerance:
+            verdict = "  SLOWER"
+            regressions += 1
+        elif change < -tolerance:
+            verdict = "  faster"
+
+        if result["work"] != old["work"]:
+            verdict += "  (different work)"
+
+        print(f"{result['name']:<36} {old['min'] * 1e3:>10.3f} "
+              f"{result['min'] * 1e3:>10.3f} {change:>+8.1%}{verdict}")
+
+    return regressions
+
+
+def bench_suite(kinds: list[str],
+                seed: int,
+                repeat: int,
+                frames: int,
+                output: str | None,
+                baseline: str | None,
+                tolerance: float) -> int:
+    """Run the suite, write the results as JSON to 'output' if given,
+    and compare them to the results in the file 'baseline' if given.
+
+    Return the number of regressions.
+
+    """
+    results = run_suite(kinds, seed, repeat, frames)
+
+    report = {
+        "seed": seed,
+        "repeat": repeat,
+        "frames": frames,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=1)
+
+    if baseline is None:
+        return 0
+
+    with open(baseline) as f:
+        old = json.load(f)
+
+    if (old["seed"], old["frames"]) != (seed, frames):
+        print("warning: the baseline was run with a different seed or "
+              "number of frames", file=sys.stderr)
+
+    return compare(results, old["results"], tolerance)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", default=0, type=cs.parse_seed)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    carve = subparsers.add_parser("carve", help="time maze generation")
+    carve.add_argument("--sizes",
+                       nargs="+",
+                       type=int,
+                       default=[10, 50, 100, 250, 500, 1000, 2000])
+    carve.add_argument("-a", "--algorithm",
+                       choices=generators.GENERATORS.keys(),
+                       default="hunt-and-kill")
+
+    crawlers = subparsers.add_parser("crawlers",
+                                     help="time one step of every crawler")
+    crawlers.add_argument("--counts",
+                          nargs="+",
+                          type=int,
+                          default=[100, 1000, 10000])
+    crawlers.add_argument("--ticks", default=100, type=int)
+
+    hunt = subparsers.add_parser("hunt",
+                                 help="time the crawlers' pathfinding")
+    hunt.add_argument("--counts",
+                      nargs="+",
+                      type=int,
+                      default=[100, 1000, 10000, 100000])
+    hunt.add_argument("--ticks", default=100, type=int)
+    hunt.add_argument("--size", default=200, type=int)
+
+    kinds = list(dict.fromkeys(kind for kind, _ in SUITE))
+
+    suite = subparsers.add_parser("suite",
+                                  help="run every benchmark scenario, and "
+                                  "compare against a baseline")
+    suite.add_argument("--only",
+                       nargs="+",
+                       choices=kinds,
+                       default=kinds,
+                       help="only run scenarios of these kinds")
+    suite.add_argument("--repeat", default=5, type=int)
+    suite.add_argument("--frames",
+                       default=300,
+                       type=int,
+                       help="the number of frames in the frame scenarios")
+    suite.add_argument("-o", "--output",
+                       metavar="FILE",
+                       help="write the results to FILE as JSON")
+    suite.add_argument("--baseline",
+                       metavar="FILE",
+                       help="compare the results to those in FILE, "
+                       "written by an earlier --output, and exit with an "
+                       "error if any are slower")
+    suite.add_argument("--tolerance",
+                       default=0.2,
+                       type=float,
+                       help="how much slower than the baseline a result "
+                       "can be, as a fraction (default 0.2)")
+
+    args = parser.parse_args()
+
+    match args.benchmark:
+        case "carve":
+            bench_carve(args.sizes, args.seed, args.algorithm)
+        case "crawlers":
+            bench_crawlers(args.counts, args.ticks, args.seed)
+        case "hunt":
+            bench_hunt(args.counts, args.ticks, args.seed, args.size)
+        case "suite":
+            regressions = bench_suite(args.only,
+                                      args.seed,
+                                      args.repeat,
+                                      args.frames,
+                                      args.output,
+                                      args.baseline,
+                                      args.tolerance)
+
+            if regressions:
+                sys.exit(1)
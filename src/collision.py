@@ -0,0 +1,153 @@
+import numpy as np
+import pygame
+import constants as cs
+from maze import Tile, TileMap
+from world import EntityGroup, Rects, overlap_pairs
+
+
+# The number of rects tested for collisions so far. The profiler reads
+# and resets it every frame.
+tests = 0
+
+# Translation table from tile codes to 1 for solid tiles, 0 otherwise.
+_SOLID = bytes(1 if i == Tile.PILLAR else 0 for i in range(256))
+
+
+class TileOccupancy:
+    """Record which tiles of the level are solid, so that blocking
+    checks against the level's walls are a matter of a few lookups.
+
+    Fields:
+
+    width, height: The size of the level, in tiles.
+
+    solid: One byte per tile, laid out row by row; nonzero if the tile
+    blocks movement.
+
+    """
+    def __init__(self, width: int = 0, height: int = 0):
+        self.reset(width, height)
+
+    def reset(self, width: int, height: int) -> None:
+        """Clear the map, and resize it to the given level size."""
+
+        self.width = width
+        self.height = height
+        self.solid = bytearray(width * height)
+
+    def fill(self, tile_map: TileMap) -> None:
+        """Copy the solid tiles of 'tile_map' into the map."""
+
+        start = tile_map.top * self.width
+        end = start + len(tile_map.tiles)
+
+        self.solid[start:end] = tile_map.tiles.translate(_SOLID)
+
+    def blocks(self, rect: pygame.Rect) -> bool:
+        """Return whether 'rect', in pixel units, overlaps a solid tile.
+
+        Only the handful of tiles under the rect are looked at, so the
+        cost doesn't depend on the size of the level. Anything outside
+        the level counts as solid.
+
+        """
+        if rect.width <= 0 or rect.height <= 0:
+            return False
+
+        x_min, y_min = cs.compute_grid_coords(rect.left, rect.top)
+        x_max, y_max = cs.compute_grid_coords(rect.right - 1, rect.bottom - 1)
+
+        if x_min < 0 or y_min < 0:
+            return True
+
+        if x_max >= self.width or y_max >= self.height:
+            return True
+
+        for y in range(y_min, y_max + 1):
+            row = y * self.width
+
+            for x in range(x_min, x_max + 1):
+                if self.solid[row + x]:
+                    return True
+
+        return False
+
+    def blocks_many(self, rects: Rects) -> np.ndarray:
+        """Return whether each of 'rects' overlaps a solid tile, as an
+        array of bools.
+
+        The rects must be no bigger than a tile, so that each of them
+        lies within the tiles under its four corners.
+
+        """
+        x, y, width, height = rects
+
+        left, top = x // cs.LEVEL_FACTOR, y // cs.LEVEL_FACTOR
+        right = (x + width - 1) // cs.LEVEL_FACTOR
+        bottom = (y + height - 1) // cs.LEVEL_FACTOR
+
+        inside = ((left >= 0) & (top >= 0)
+                  & (right < self.width) & (bottom < self.height))
+
+        # Keep the lookups below in range; rects outside the level are
+        # blocked regardless.
+        left = np.clip(left, 0, self.width - 1)
+        right = np.clip(right, 0, self.width - 1)
+        top = np.clip(top, 0, self.height - 1) * self.width
+        bottom = np.clip(bottom, 0, self.height - 1) * self.width
+
+        solid = np.frombuffer(self.solid, dtype=np.uint8)
+
+        corners = (solid[top + left] | solid[top + right]
+                   | solid[bottom + left] | solid[bottom + right])
+
+        return ~inside | (corners != 0)
+
+
+def colliding(rect: pygame.Rect,
+              group: pygame.sprite.AbstractGroup
+              ) -> list[pygame.sprite.Sprite]:
+    """Return the sprites in 'group' whose rects collide with 'rect'.
+
+    This goes through the world's arrays for an EntityGroup, and falls
+    back on checking every sprite for any other kind of group.
+
+    """
+    global tests
+    tests += 1
+
+    if isinstance(group, EntityGroup):
+        return group.colliding(rect)
+
+    return [sprite for sprite in group if rect.colliderect(sprite.rect)]
+
+
+def colliding_many(rects: Rects,
+                   obstacles: pygame.sprite.AbstractGroup | TileOccupancy,
+                   slots: np.ndarray | None = None) -> np.ndarray:
+    """Return whether each of 'rects' collides with anything in
+    'obstacles', as an array of bools.
+
+    'slots' gives the world slots of the entities the rects belong to,
+    if any; see 'EntityGroup.colliding_many'.
+
+    """
+    global tests
+    tests += len(rects[0])
+
+    if isinstance(obstacles, TileOccupancy):
+        return obstacles.blocks_many(rects)
+
+    if isinstance(obstacles, EntityGroup):
+        return obstacles.colliding_many(rects, slots)
+
+    # Any other group is expected to be small, e.g. the sword.
+    hit = np.zeros(len(rects[0]), dtype=np.bool_)
+
+    for sprite in obstacles:
+        query = tuple(np.array([v]) for v in sprite.rect)
+        i, _ = overlap_pairs(rects, query)
+
+        hit[i] = True
+
+    return hit
@@ -1,3 +1,5 @@
+import argparse
+
 TILE_LEN = 16
 SCALE_FACTOR = 1
 GRID_X = 10
@@ -6,6 +8,17 @@ NUM_TILES_X = 3 * GRID_X + 1
 NUM_TILES_Y = 3 * GRID_Y + 1
 LEVEL_FACTOR = TILE_LEN * SCALE_FACTOR
 
+# The most of the level shown on screen at once, in tiles.
+VIEW_TILES_X = 31
+VIEW_TILES_Y = 31
+
+# The side length of a square chunk of the level, in tiles.
+CHUNK_LEN = 16
+
+# The largest seed a replay can hold (see 'replay.HEADER'); NumPy's
+# generators don't take negative seeds either.
+MAX_SEED = (1 << 64) - 1
+
 
 def configure_scale_factor(scale_factor: int = 1):
     """Configure SCALE_FACTOR from the outside.
@@ -18,6 +31,19 @@ def configure_scale_factor(scale_factor: int = 1):
     LEVEL_FACTOR = TILE_LEN * SCALE_FACTOR
 
 
+def configure_grid_size(grid_x: int, grid_y: int):
+    """Configure GRID_X and GRID_Y from the outside.
+
+    This also accordingly reconfigures NUM_TILES_X and NUM_TILES_Y."""
+
+    global GRID_X, GRID_Y, NUM_TILES_X, NUM_TILES_Y
+
+    GRID_X = grid_x
+    GRID_Y = grid_y
+    NUM_TILES_X = 3 * GRID_X + 1
+    NUM_TILES_Y = 3 * GRID_Y + 1
+
+
 def compute_pixel_coords(x_grid: int, y_grid: int) -> tuple[int, int]:
     """Return inputs scaled to pixel units, appropriate for display on
     the pygame screen."""
@@ -36,3 +62,43 @@ def compute_grid_coords(x_pixel: int, y_pixel: int) -> tuple[int, int]:
     ys = y_pixel // LEVEL_FACTOR
 
     return xs, ys
+
+
+def compute_chunk_coords(x_grid: int, y_grid: int) -> tuple[int, int]:
+    """Return the coordinates of the chunk containing the given tile."""
+
+    return x_grid // CHUNK_LEN, y_grid // CHUNK_LEN
+
+
+def compute_cell_coords(x_grid: int, y_grid: int) -> tuple[int, int]:
+    """Return the coordinates of the maze cell containing the given
+    tile.
+
+    Each cell is three tiles wide, counting the wall on its top and
+    left sides.
+
+    """
+    return x_grid // 3, y_grid // 3
+
+
+def compute_view_size() -> tuple[int, int]:
+    """Return the size of the screen in pixels: enough to show the
+    whole level, up to VIEW_TILES_X by VIEW_TILES_Y tiles."""
+
+    return compute_pixel_coords(min(NUM_TILES_X, VIEW_TILES_X),
+                                min(NUM_TILES_Y, VIEW_TILES_Y))
+
+
+def parse_seed(text: str) -> int:
+    """Parse a seed given on the command line, for argparse."""
+
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid seed: {text!r}")
+
+    if not 0 <= value <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f"seed must be between 0 and "
+                                         f"{MAX_SEED}, not {value}")
+
+    return value
@@ -0,0 +1,121 @@
+import pygame
+
+
+# The keys the game responds to during play, in the order of their bits
+# within a key mask.
+KEYS = [pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d, pygame.K_k]
+
+# Names for those keys, as used in input scripts.
+KEY_NAMES = {pygame.key.name(key): key for key in KEYS}
+
+
+class Pressed:
+    """The state of the game's keys during one tick, packed into a
+    bitmask.
+
+    It can be indexed by key constant just like the result of
+    'pygame.key.get_pressed'.
+
+    """
+    def __init__(self, mask: int = 0):
+        self.mask = mask
+
+    @classmethod
+    def from_keys(cls, keys) -> "Pressed":
+        """Build a key mask from anything indexable by key constant."""
+
+        mask = 0
+
+        for bit, key in enumerate(KEYS):
+            if keys[key]:
+                mask |= 1 << bit
+
+        return cls(mask)
+
+    def __getitem__(self, key: int) -> bool:
+        if key not in KEYS:
+            return False
+
+        return bool(self.mask & (1 << KEYS.index(key)))
+
+
+class KeyboardControls:
+    """Read the keys from the actual keyboard."""
+
+    def poll(self) -> Pressed:
+        return Pressed.from_keys(pygame.key.get_pressed())
+
+
+class ScriptedControls:
+    """Play back keys from a script, one tick at a time.
+
+    A script consists of lines of the form '<ticks> <keys>', meaning
+    that the given keys are held down for that many ticks. Keys are
+    given by name and concatenated (e.g. 'wk'), or as '-' for none.
+    Blank lines and lines starting with '#' are ignored.
+
+    Once the script runs out, no keys are pressed.
+
+    """
+    def __init__(self, script: str):
+        self.masks: list[int] = []
+        self.tick = 0
+
+        for line in script.splitlines():
+            line = line.strip()
+
+            if line == "" or line.startswith("#"):
+                continue
+
+            ticks, names = line.split()
+            mask = 0
+
+            if names != "-":
+                for name in names:
+                    if name not in KEY_NAMES:
+                        raise ValueError(f"Unknown key in script: {name}")
+
+                    mask |= 1 << KEYS.index(KEY_NAMES[name])
+
+            self.masks.extend([mask] * int(ticks))
+
+    @classmethod
+    def load(cls, filename: str) -> "ScriptedControls":
+        with open(filename) as f:
+            return cls(f.read())
+
+    @classmethod
+    def from_masks(cls, masks: list[int]) -> "ScriptedControls":
+        """Play back 'masks', one key mask per tick, e.g. from a
+        replay."""
+
+        controls = cls("")
+        controls.masks = masks
+
+        return controls
+
+    def poll(self) -> Pressed:
+        if self.tick >= len(self.masks):
+            return Pressed()
+
+        mask = self.masks[self.tick]
+        self.tick += 1
+
+        return Pressed(mask)
+
+
+class RecordingControls:
+    """Pass on the keys read from other controls, keeping a record of
+    each tick's key mask in 'masks'."""
+
+    def __init__(self,
+                 controls: KeyboardControls | ScriptedControls,
+                 masks: list[int]):
+        self.controls = controls
+        self.masks = masks
+
+    def poll(self) -> Pressed:
+        keys = self.controls.poll()
+        self.masks.append(keys.mask)
+
+        return keys
@@ -0,0 +1,294 @@
+from collections.abc import Callable, Iterable, Iterator
+import random
+from maze import Cell, Grid, Strip, TileMap, get_neighbors, rasterize_level
+
+
+def hunt_and_kill(grid: Grid, rng: random.Random | None = None) -> None:
+    """Carve the grid with the Hunt and Kill algorithm.
+
+    This is the algorithm implemented by 'Grid.carve' itself.
+
+    """
+    grid.carve(rng)
+
+
+def recursive_backtracker(grid: Grid,
+                          rng: random.Random | None = None) -> None:
+    """Carve the grid with a randomized depth first search.
+
+    The recursion is replaced by an explicit stack, so that large grids
+    don't run into Python's recursion limit.
+
+    """
+    if rng is None:
+        rng = random.Random()
+
+    x = rng.randrange(grid.width)
+    y = rng.randrange(grid.height)
+
+    # Cells are marked as visited here as well as in the grid, since a
+    # grid cell's bits stay zero until it's first linked to something.
+    visited = bytearray(grid.width * grid.height)
+    visited[y * grid.width + x] = 1
+
+    stack = [(x, y)]
+
+    while stack:
+        x, y = stack[-1]
+
+        neighbors = [(xn, yn)
+                     for xn, yn in get_neighbors(x, y, grid.width, grid.height)
+                     if not visited[yn * grid.width + xn]]
+
+        if neighbors == []:
+            stack.pop()
+            continue
+
+        new_x, new_y = rng.choice(neighbors)
+        grid.link(x, y, new_x, new_y)
+        visited[new_y * grid.width + new_x] = 1
+
+        stack.append((new_x, new_y))
+
+
+def eller(grid: Grid, rng: random.Random | None = None) -> None:
+    """Carve the grid one row at a time with Eller's algorithm.
+
+    See 'eller_strips'.
+
+    """
+    width = grid.width
+
+    for strip in eller_strips(width, grid.height, rng):
+        start = strip.y * width
+        grid.cells[start:start + width] = strip.cells
+
+
+def eller_strips(width: int,
+                 height: int | None = None,
+                 rng: random.Random | None = None) -> Iterator[Strip]:
+    """Generate a maze with Eller's algorithm, yielding each row as a
+    'Strip' as soon as it's finished.
+
+    Only the current row and its set membership are kept around, so
+    memory is O(width) no matter how many rows are generated. If
+    'height' is None, rows are generated forever.
+
+    """
+    if rng is None:
+        rng = random.Random()
+
+    # sets[x] is the label of the set that cell (x, y) belongs to, and
+    # members[label] lists the columns in that set.
+    sets = list(range(width))
+    members = {x: [x] for x in range(width)}
+    next_label = width
+
+    row = bytearray(width)
+    y = 0
+
+    while True:
+        last_row = y == height - 1 if height is not None else False
+
+        # Randomly join adjacent cells that aren't yet connected. On
+        # the last row, every such pair must be joined.
+        for x in range(width - 1):
+            a, b = sets[x], sets[x + 1]
+
+            if a != b and (last_row or rng.random() < 0.5):
+                row[x] |= Cell.RIGHT.value
+                row[x + 1] |= Cell.LEFT.value
+
+                # Relabel the smaller of the two sets.
+                if len(members[a]) < len(members[b]):
+                    a, b = b, a
+
+                for xb in members[b]:
+                    sets[xb] = a
+
+                members[a].extend(members.pop(b))
+
+        if last_row:
+            yield Strip(y, row, last=True)
+            return
+
+        # Each set must extend down into the next row at least once.
+        # Cells that aren't reached that way start out in sets of
+        # their own.
+        next_row = bytearray(width)
+        next_sets = []
+        next_members: dict[int, list[int]] = {}
+
+        for x in range(width):
+            next_sets.append(next_label)
+            next_label += 1
+
+        for label, xs in members.items():
+            rng.shuffle(xs)
+
+            for i, x in enumerate(xs):
+                if i == 0 or rng.random() < 0.5:
+                    row[x] |= Cell.DOWN.value
+                    next_row[x] |= Cell.UP.value
+                    next_sets[x] = label
+
+        for x, label in enumerate(next_sets):
+            next_members.setdefault(label, []).append(x)
+
+        yield Strip(y, row)
+
+        row, sets, members = next_row, next_sets, next_members
+        y += 1
+
+
+def wilson(grid: Grid, rng: random.Random | None = None) -> None:
+    """Carve the grid with Wilson's algorithm.
+
+    This yields a uniformly random spanning tree, by adding one
+    loop-erased random walk to the maze at a time.
+
+    """
+    if rng is None:
+        rng = random.Random()
+
+    width, height = grid.width, grid.height
+
+    in_maze = bytearray(width * height)
+    in_maze[rng.randrange(width * height)] = 1
+
+    # The cell last stepped to from each cell during the current
+    # walk. Overwriting an entry when the walk comes back to a cell is
+    # what erases the loop.
+    step = [0] * (width * height)
+
+    for start in range(width * height):
+        # Walk randomly until we hit the maze.
+        i = start
+
+        while not in_maze[i]:
+            x, y = i % width, i // width
+            xn, yn = rng.choice(get_neighbors(x, y, width, height))
+
+            step[i] = yn * width + xn
+            i = step[i]
+
+        # Then add the loop-erased path to the maze.
+        i = start
+
+        while not in_maze[i]:
+            in_maze[i] = 1
+
+            j = step[i]
+            grid.link(i % width, i // width, j % width, j // width)
+
+            i = j
+
+
+def kruskal(grid: Grid, rng: random.Random | None = None) -> None:
+    """Carve the grid with a randomized Kruskal's algorithm.
+
+    Walls are removed in random order whenever they separate two
+    components, which are tracked with a union-find structure.
+
+    """
+    if rng is None:
+        rng = random.Random()
+
+    width, height = grid.width, grid.height
+
+    # Each wall is represented by the index of the cell above or to
+    # the left of it, plus whether it's a vertical wall.
+    walls = [(y * width + x, True)
+             for y in range(height)
+             for x in range(width - 1)]
+    walls.extend((y * width + x, False)
+                 for y in range(height - 1)
+                 for x in range(width))
+
+    rng.shuffle(walls)
+
+    parent = list(range(width * height))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            # Path halving.
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+
+        return i
+
+    for i, vertical in walls:
+        j = i + 1 if vertical else i + width
+
+        root_i, root_j = find(i), find(j)
+
+        if root_i != root_j:
+            parent[root_j] = root_i
+            grid.link(i % width, i // width, j % width, j // width)
+
+
+def binary_tree(grid: Grid, rng: random.Random | None = None) -> None:
+    """Carve the grid with the Binary Tree algorithm.
+
+    Every cell is linked either up or to the left, so this runs in a
+    single pass with no bookkeeping at all. The resulting mazes have a
+    strong diagonal bias, and open top and left edges.
+
+    """
+    if rng is None:
+        rng = random.Random()
+
+    for y in range(grid.height):
+        for x in range(grid.width):
+            choices = []
+
+            if y > 0:
+                choices.append((x, y - 1))
+
+            if x > 0:
+                choices.append((x - 1, y))
+
+            if choices:
+                new_x, new_y = rng.choice(choices)
+                grid.link(x, y, new_x, new_y)
+
+
+# Each generator takes an empty grid, and carves a perfect maze (that
+# is, a spanning tree) into it using 'Grid.link'. All random choices
+# are made with the optional 'random.Random' instance passed along
+# with the grid, so that a seeded one always yields the same maze.
+GENERATORS: dict[str, Callable[[Grid, random.Random | None], None]] = {
+    "hunt-and-kill": hunt_and_kill,
+    "recursive-backtracker": recursive_backtracker,
+    "eller": eller,
+    "wilson": wilson,
+    "kruskal": kruskal,
+    "binary-tree": binary_tree,
+}
+
+
+def level_strips(width: int,
+                 height: int,
+                 algorithm: str,
+                 seed: int | None = None) -> Iterable[Strip]:
+    """Return the rows of a new level's maze, carved from 'seed' by the
+    generator named 'algorithm'."""
+
+    grid = Grid(width, height)
+    GENERATORS[algorithm](grid, random.Random(seed))
+
+    return grid.strips()
+
+
+def carve_level(width: int,
+                height: int,
+                algorithm: str,
+                seed: int | None = None) -> tuple[bytearray, TileMap]:
+    """Carve a new level's maze and rasterize it (see 'level_strips' and
+    'maze.rasterize_level').
+
+    Both are pure Python, so this is meant to be run in a worker
+    process, where it doesn't hold up the game loop.
+
+    """
+    return rasterize_level(level_strips(width, height, algorithm, seed))
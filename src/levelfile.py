@@ -0,0 +1,163 @@
+import mmap
+import struct
+from collections.abc import Iterable, Iterator
+import numpy as np
+from maze import Cell, Strip
+
+
+# The header: a magic number, the format version, and the width and
+# height of the maze in cells, all little-endian.
+HEADER = struct.Struct("<4sB3xII")
+MAGIC = b"LIAD"
+VERSION = 1
+
+
+def _row_size(width: int) -> int:
+    """Return the number of bytes a packed row of 'width' cells takes
+    up."""
+
+    return (width + 1) // 2
+
+
+def pack_row(cells: bytearray) -> bytes:
+    """Pack a row of cells two to a byte, the first of each pair in the
+    low nibble.
+
+    A row of odd length is padded with an empty cell.
+
+    """
+    row = np.frombuffer(cells, dtype=np.uint8)
+
+    if len(row) % 2:
+        row = np.append(row, np.uint8(0))
+
+    return (row[0::2] | (row[1::2] << 4)).tobytes()
+
+
+def _unpack_rows(packed: np.ndarray, width: int) -> bytearray:
+    """Unpack a 2D array of packed rows into a bytearray of cells, row
+    by row, dropping the padding."""
+
+    cells = np.empty((packed.shape[0], 2 * packed.shape[1]), dtype=np.uint8)
+    cells[:, 0::2] = packed & 0x0F
+    cells[:, 1::2] = packed >> 4
+
+    return bytearray(cells[:, :width].tobytes())
+
+
+def _link_problem(cells: np.ndarray) -> str | None:
+    """Return what's wrong with the links of 'cells', a 2D array of
+    direction bits, or None if each link stays within the maze and is
+    matched by one back from the cell it leads to.
+
+    The rest of the game relies on both, e.g. to look up a cell's
+    neighbors without checking the bounds.
+
+    """
+    up = (cells & Cell.UP.value) != 0
+    down = (cells & Cell.DOWN.value) != 0
+    left = (cells & Cell.LEFT.value) != 0
+    right = (cells & Cell.RIGHT.value) != 0
+
+    if up[0].any() or down[-1].any() or left[:, 0].any() or right[:, -1].any():
+        return "has links leading out of the maze"
+
+    if (down[:-1] != up[1:]).any() or (right[:, :-1] != left[:, 1:]).any():
+        return "has links that only lead one way"
+
+    return None
+
+
+def save(filename: str,
+         strips: Iterable[Strip],
+         width: int,
+         height: int) -> None:
+    """Write the maze given by 'strips' to 'filename'.
+
+    Only the maze's direction bits are stored, four bits per cell; the
+    tile map is derived from them on loading, one strip at a time, by
+    'maze.rasterize_strip'. Each row is packed into whole bytes, so
+    that any row can be read without touching the others.
+
+    """
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height))
+
+        for strip in strips:
+            f.write(pack_row(strip.cells))
+
+
+class LevelFile:
+    """A maze saved by 'save', memory-mapped for reading.
+
+    Opening a file checks that its links are sound, in a single pass
+    over the mapping, so that a corrupt file is rejected up front rather
+    than partway through a game. Rows are then unpacked as they're
+    asked for.
+
+    Fields:
+
+    width, height: The size of the maze, in cells.
+
+    """
+    def __init__(self, filename: str):
+        with open(filename, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) < HEADER.size:
+            raise ValueError(f"{filename} is too short to be a level file")
+
+        magic, version, self.width, self.height = HEADER.unpack_from(
+            self.data)
+
+        if magic != MAGIC:
+            raise ValueError(f"{filename} isn't a level file")
+
+        if version != VERSION:
+            raise ValueError(f"{filename} has unsupported version "
+                             f"{version}")
+
+        expected = HEADER.size + self.height * _row_size(self.width)
+
+        if len(self.data) != expected:
+            raise ValueError(f"{filename} should be {expected} bytes long, "
+                             f"but is {len(self.data)}")
+
+        if self.width < 1 or self.height < 1:
+            raise ValueError(f"{filename} holds an empty maze")
+
+        cells = _unpack_rows(self._packed(0, self.height), self.width)
+        problem = _link_problem(np.frombuffer(cells, dtype=np.uint8)
+                                .reshape(self.height, self.width))
+
+        if problem is not None:
+            raise ValueError(f"{filename} {problem}")
+
+    def _packed(self, start: int, stop: int) -> np.ndarray:
+        """Return the packed rows from 'start' up to 'stop', as a 2D
+        view onto the mapping."""
+
+        row_size = _row_size(self.width)
+        rows = np.frombuffer(self.data,
+                             dtype=np.uint8,
+                             count=(stop - start) * row_size,
+                             offset=HEADER.size + start * row_size)
+
+        return rows.reshape(stop - start, row_size)
+
+    def strips(self) -> Iterator[Strip]:
+        """Yield the rows of the maze as strips, from top to bottom."""
+
+        for y in range(self.height):
+            cells = _unpack_rows(self._packed(y, y + 1), self.width)
+
+            yield Strip(y, cells, last=y == self.height - 1)
+
+    def close(self) -> None:
+        self.data.close()
+
+    def __enter__(self) -> "LevelFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
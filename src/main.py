@@ -1,15 +1,39 @@
 import pygame
-import random
+import numpy as np
 import constants as cs
 from tiledef import TileDef
 from typedefs import Point
 from spritesheet import Spritesheet
+from render import Background, Camera, DirtyRenderer, FullRenderer
+from render import chunks_within, render_chunk
+from collision import TileOccupancy, colliding, colliding_many
+from profiler import Export, FrameProfiler, NullProfiler, Overlay
+import collision
+from controls import KeyboardControls, RecordingControls, ScriptedControls
+from replay import Replay
+import services
+from services import autosave, export_telemetry
+from world import DIRECTIONS, RECORD, Direction, EntityGroup, Kind, World
+from world import overlap_pairs
+from pathfinding import FlowField
 import maze
+import generators
+import levelfile
 from pygame.math import Vector2
-import abc
 from enum import Enum, auto
 import os
 import argparse
+import asyncio
+import functools
+import hashlib
+import multiprocessing
+import random
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine, Iterable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 
 
 class CollisionType(Enum):
@@ -23,20 +47,38 @@ class CollisionType(Enum):
     WIN = auto()
 
 
-class Direction(Enum):
-    """An enum for using vectors as hashmap keys."""
-    UP = Vector2(0, -1)
-    DOWN = Vector2(0, 1)
-    LEFT = Vector2(-1, 0)
-    RIGHT = Vector2(1, 0)
+class Outcome(Enum):
+    """The ways a game can end, along with what to tell the player."""
+    DIED = "You died!"
+    WON = "You won!"
+
+
+class Moving(pygame.sprite.Sprite):
+    """Parent class of player and crawler sprites.
+
+    A moving sprite is only a view onto an entity in 'world', at slot
+    'self.index'; its rect, direction, timers and so on are read from
+    and written to the world's arrays. This lets the Crawler class step
+    every crawler at once.
+
+    'Moving.world' is the world in play. A sprite can be given a world
+    of its own instead, for a level that's still being built.
 
+    """
+
+    world: World = World()
+    kind: Kind
 
-class Moving(pygame.sprite.Sprite, abc.ABC):
-    """Parent class of player and crawler sprites."""
+    # How fast sprites of this class move, in pixels per second.
+    base_speed = 200
 
-    def __init__(self, x: int, y: int, **animations):
+    def __init__(self, x: int, y: int, world: World | None = None,
+                 **animations):
         pygame.sprite.Sprite.__init__(self)
 
+        if world is not None:
+            self.world = world
+
         self.motions_table = {
             Direction.DOWN: [animations["down"][0], animations["down"][1]],
             Direction.UP: [animations["up"][0], animations["up"][1]],
@@ -45,16 +87,87 @@ class Moving(pygame.sprite.Sprite, abc.ABC):
         }
 
         self.animation_speed = 5
-        self.animation_index = 0
-        self.speed = 200
+
+        self.index = self.world.spawn(self.kind, self.spawn_rect(x, y))
+
+        self.speed = self.base_speed
         self.direction = Direction.DOWN
 
-        # Define the image and rect of this sprite.
-        self.image = self.motions_table[self.direction][0]
+    @property
+    def rect(self) -> pygame.Rect:
+        return self.world.rect(self.index)
+
+    @rect.setter
+    def rect(self, rect: pygame.Rect):
+        self.world.x[self.index] = rect.x
+        self.world.y[self.index] = rect.y
+
+    def interpolated_rect(self, alpha: float) -> pygame.Rect:
+        """Return where to draw the sprite, a fraction 'alpha' of the
+        way from where it was before the last tick to where it is."""
+
+        return self.world.interpolated_rect(self.index, alpha)
+
+    @property
+    def direction(self) -> Direction:
+        return DIRECTIONS[self.world.direction[self.index]]
+
+    @direction.setter
+    def direction(self, direction: Direction):
+        self.world.direction[self.index] = direction.code
+
+    @property
+    def speed(self) -> float:
+        return float(self.world.speed[self.index])
+
+    @speed.setter
+    def speed(self, speed: float):
+        self.world.speed[self.index] = speed
+
+    @property
+    def timer(self) -> float:
+        return float(self.world.timer[self.index])
+
+    @timer.setter
+    def timer(self, timer: float):
+        self.world.timer[self.index] = timer
+
+    @property
+    def cooldown(self) -> float:
+        return float(self.world.cooldown[self.index])
+
+    @cooldown.setter
+    def cooldown(self, cooldown: float):
+        self.world.cooldown[self.index] = cooldown
+
+    @property
+    def animation_index(self) -> float:
+        return float(self.world.animation[self.index])
 
+    @animation_index.setter
+    def animation_index(self, animation_index: float):
+        self.world.animation[self.index] = animation_index
+
+    @property
+    def image(self) -> pygame.Surface:
+        """The image used to display the sprite, based on the direction
+        the sprite is facing and how far along its animation is."""
+
+        images = self.motions_table[self.direction]
+
+        return images[int(self.animation_index)]
+
+    @staticmethod
+    def spawn_rect(x: int, y: int) -> pygame.Rect:
+        """Return the rect of a moving sprite spawned at tile (x, y).
+
+        It's a little smaller than the tile (and the sprite's images.)
+
+        """
         xs, ys = cs.compute_pixel_coords(x, y)
-        self.rect: pygame.Rect = self.image.get_rect(x=xs, y=ys)
-        self.rect = self.rect.inflate(-5.0, -5.0)
+
+        return pygame.Rect(xs, ys, cs.LEVEL_FACTOR, cs.LEVEL_FACTOR).inflate(
+            -5.0, -5.0)
 
     @classmethod
     def spawn(cls, x, y):
@@ -66,12 +179,13 @@ class Moving(pygame.sprite.Sprite, abc.ABC):
     def kill(cls, sprite):
         """Remove an instance of this class from play."""
         cls.group.remove(sprite)
+        sprite.world.release(sprite.index)
 
     def animate(self, dt):
-        """Update the image used to display the sprite, based on the
-        current direction the sprite is facing.
+        """Advance the animation of the sprite.
 
-        The current direction is stored in 'self.direction'.
+        The images cycled through depend on the current direction,
+        stored in 'self.direction'.
 
         """
 
@@ -82,25 +196,32 @@ class Moving(pygame.sprite.Sprite, abc.ABC):
         if self.animation_index >= len(images):
             self.animation_index = 0
 
-        self.image = images[int(self.animation_index)]
-
     def check_block(self,
                     move_by: Vector2,
-                    groups: list[pygame.sprite.Group]) -> Vector2:
+                    groups: list[pygame.sprite.Group | TileOccupancy]
+                    ) -> Vector2:
         """Return displacement, or zero-vector if an obstacle is
         encountered.
 
+        Obstacles fixed to the tile grid are given as a TileOccupancy
+        map rather than a group, so that only the tiles under the
+        tentative position need to be looked at.
+
         """
 
         tentative_pos = self.rect.move(move_by)
 
         for group in groups:
-            for obstacle in group:
-                collided = tentative_pos.colliderect(obstacle.rect)
+            if isinstance(group, TileOccupancy):
+                if group.blocks(tentative_pos):
+                    return Vector2(0, 0)
+
+                continue
 
+            for obstacle in colliding(tentative_pos, group):
                 # Make sure that a given sprite can't "collide" with
                 # itself.
-                if obstacle.rect != self.rect and collided:
+                if obstacle.rect != self.rect:
                     return Vector2(0, 0)
 
         return move_by
@@ -116,21 +237,14 @@ class Moving(pygame.sprite.Sprite, abc.ABC):
         tentative = self.rect.move(move_by)
 
         for group in groups:
-            for sprite in group:
-                collided = tentative.colliderect(sprite.rect)
-
-                if collided:
-                    self.__class__.kill(self)
-                    break
+            if colliding(tentative, group):
+                self.__class__.kill(self)
+                break
 
-    @abc.abstractmethod
-    def update(self, dt, collision_type: dict[CollisionType,
-                                              list[pygame.sprite.Group]]):
-        """This sprite's 'update' method, to be overridden by child
-        classes.
+    def move(self, displacement: Vector2):
+        """Move this sprite by 'displacement'."""
 
-        """
-        pass
+        self.rect = self.rect.move(displacement)
 
 
 class Fixture(pygame.sprite.Sprite):
@@ -142,6 +256,7 @@ class Fixture(pygame.sprite.Sprite):
     group.
 
     """
+    tile: maze.Tile
 
     def __init__(self, x: int, y: int, image: pygame.Surface):
         super().__init__()
@@ -151,52 +266,46 @@ class Fixture(pygame.sprite.Sprite):
         xs, ys = cs.compute_pixel_coords(x, y)
         self.rect = self.image.get_rect(x=xs, y=ys)
 
+    @classmethod
+    def from_tiles(cls, tile_map: maze.TileMap) -> list["Fixture"]:
+        """Create a sprite of this class for each of its tiles in the
+        part of the level covered by 'tile_map'.
 
-class Pillar(Fixture):
-    group: pygame.sprite.Group = pygame.sprite.Group()
+        The sprites aren't added to any group, so this is safe to call
+        from a worker thread.
 
-    def __init__(self, x: int, y: int):
-        super().__init__(x, y, sheet.get(TileDef.PILLAR))
+        """
+        return [cls(x, y) for x, y in tile_map.positions(cls.tile)]
 
-    @classmethod
-    def spawn_tiles(cls, occupied_positions: set[Point]):
-        """Define pillar positions in the level."""
 
-        for x in range(cs.GRID_X):
-            for y in range(cs.GRID_Y):
-                pos = maze.compute_pillar_position(grid, x, y)
+class Pillar(Fixture):
+    """A wall tile.
+
+    Pillars are only ever drawn as part of the background. For
+    blocking, the Pillar class keeps a TileOccupancy map of the level,
+    which is what moving sprites are checked against.
 
-                for p in pos:
-                    occupied_positions.add(p)
+    """
+    tile = maze.Tile.PILLAR
+    occupancy: TileOccupancy = TileOccupancy()
 
-            for x, y in occupied_positions:
-                pillar = cls(x, y)
-                cls.group.add(pillar)
+    def __init__(self, x: int, y: int):
+        super().__init__(x, y, sheet.get(TileDef.PILLAR))
 
 
 class Floor(Fixture):
-    group: pygame.sprite.Group = pygame.sprite.Group()
+    tile = maze.Tile.FLOOR
 
     def __init__(self, x: int, y: int):
         super().__init__(x, y, sheet.get(TileDef.FLOOR))
 
-    @classmethod
-    def spawn_tiles(cls, occupied_positions: set[Point]):
-        """Define floor tile positions in the level."""
-
-        for x in range(cs.NUM_TILES_X):
-            for y in range(cs.NUM_TILES_Y):
-                if (x, y) not in occupied_positions:
-                    floor = cls(x, y)
-                    cls.group.add(floor)
-
 
 class StairsUp(Fixture):
+    tile = maze.Tile.STAIRS_UP
     group: pygame.sprite.Group = pygame.sprite.Group()
 
     def __init__(self, x: int, y: int):
         super().__init__(x, y, sheet.get(TileDef.STAIRS_UP))
-        self.__class__.group.add(self)
 
 
 class Sword(pygame.sprite.Sprite):
@@ -210,12 +319,20 @@ class Sword(pygame.sprite.Sprite):
 
 
 class Player(Moving):
-    """The player, controllable by the user via the keyboard."""
+    """The player, controllable by the user via the keyboard.
+
+    The keys are read through 'controls', which can be swapped out for
+    scripted input when running headless.
+
+    """
 
+    kind = Kind.PLAYER
     group: pygame.sprite.GroupSingle = pygame.sprite.GroupSingle()
     sword_group: pygame.sprite.GroupSingle = pygame.sprite.GroupSingle()
+    controls: (KeyboardControls | ScriptedControls
+               | RecordingControls) = KeyboardControls()
 
-    def __init__(self, x: int, y: int):
+    def __init__(self, x: int, y: int, world: World | None = None):
         animations = {
             "down": sheet.get_all([TileDef.PLAYER_DOWN_1,
                                    TileDef.PLAYER_DOWN_2]),
@@ -227,7 +344,7 @@ class Player(Moving):
                                     TileDef.PLAYER_RIGHT_2])
          }
 
-        super().__init__(x, y, **animations)
+        super().__init__(x, y, world, **animations)
 
         self.cooldown = 0.2
         self.timer = 0.0
@@ -260,12 +377,9 @@ class Player(Moving):
         tentative = self.rect.move(move_by)
 
         for group in groups:
-            for sprite in group:
-                collided = tentative.colliderect(sprite.rect)
-
-                if collided:
-                    self.won = True
-                    break
+            if colliding(tentative, group):
+                self.won = True
+                break
 
     def update(self, dt, coltype: dict[CollisionType,
                                        list[pygame.sprite.Group]]):
@@ -274,6 +388,11 @@ class Player(Moving):
 
         """
 
+        # The keys are read every tick, even while they're ignored, so
+        # that scripted and recorded input stays in step with the
+        # ticks.
+        keys = self.controls.poll()
+
         self.timer -= dt
 
         if self.timer > 0:
@@ -284,8 +403,6 @@ class Player(Moving):
 
         delta = Vector2(0, 0)
 
-        keys = pygame.key.get_pressed()
-
         if keys[pygame.K_w]:
             delta.y = -1
         elif keys[pygame.K_s]:
@@ -314,7 +431,7 @@ class Player(Moving):
         # key to move the player), or because the player encountered
         # an obstacle blocking its path.
         if actual_disp != Vector2(0, 0):
-            self.rect.move_ip(actual_disp)
+            self.move(actual_disp)
             self.animate(dt)
 
         # Update the player's direction.
@@ -335,13 +452,37 @@ class Player(Moving):
 class Crawler(Moving):
     """A subclass of MovingThing applicable to crawlers.
 
-    The only difference is in the implementation of 'update'.
+    Rather than each crawler updating itself, all of them are stepped
+    at once by 'update_all'.
 
     """
 
-    group: pygame.sprite.Group = pygame.sprite.Group()
+    kind = Kind.CRAWLER
 
-    def __init__(self, x: int, y: int):
+    # Crawlers are numerous, and collide with each other as well as
+    # with the player, so collisions against them are checked using the
+    # world's arrays.
+    group: EntityGroup = EntityGroup(Moving.world, Kind.CRAWLER)
+
+    base_speed = 100
+
+    # Crawlers out of focus are only stepped once every 'far_interval'
+    # ticks, by the time that has passed since they were last stepped.
+    far_interval = 4
+
+    # How long a crawler keeps going in one direction, in seconds.
+    initial_cooldown = 1.0
+
+    # The chance of a crawler starting out on any given floor tile.
+    density = 1/20
+
+    # How many maze cells away from the player crawlers start hunting
+    # it, going by the path between them, and the way to the player
+    # from each cell in that range.
+    hunt_distance = 10
+    field: FlowField | None = None
+
+    def __init__(self, x: int, y: int, world: World | None = None):
         animations = {
             "down": sheet.get_all([TileDef.CRAWLER_DOWN_1,
                                    TileDef.CRAWLER_DOWN_2]),
@@ -353,119 +494,925 @@ class Crawler(Moving):
                                     TileDef.CRAWLER_RIGHT_2])
         }
 
-        super().__init__(x, y, **animations)
+        super().__init__(x, y, world, **animations)
 
         # Tweaks for this particular sprite.
-        self.cooldown = 1.0
+        self.cooldown = self.initial_cooldown
         self.timer = self.cooldown
-        self.speed = 100
 
     @classmethod
-    def spawn_crawlers(cls, occupied_positions: set[Point]):
-        """Define initial crawler positions in the level.
+    def initial_records(cls,
+                        tile_map: maze.TileMap,
+                        rng: np.random.Generator) -> np.ndarray:
+        """Choose initial crawler positions in the part of the level
+        covered by 'tile_map', and return the crawlers as an array of
+        world records, as they'd be when freshly spawned.
 
-        The Crawler class manages its own group.
+        The crawlers themselves are only spawned from the records once
+        the player comes near them.
 
         """
+        tiles = np.frombuffer(tile_map.tiles, dtype=np.uint8)
+        ys, xs = np.divmod(np.flatnonzero(tiles == maze.Tile.FLOOR),
+                           tile_map.width)
+        xs += tile_map.left
+        ys += tile_map.top
 
-        for x in range(2, cs.NUM_TILES_X):
-            for y in range(2, cs.NUM_TILES_Y):
-                if (x, y) not in occupied_positions:
-                    if random.random() <= 1/20:
-                        Crawler.spawn(x, y)
+        chosen = (xs >= 2) & (ys >= 2) & (rng.random(len(xs)) <= cls.density)
 
-    def update(self, dt, coltype: dict[CollisionType,
-                                       list[pygame.sprite.Group]]):
-        self.timer -= dt
+        # Where a crawler's rect lies within its tile.
+        inset = cls.spawn_rect(0, 0)
 
-        if self.timer <= 0:
-            self.direction = random.choice([Direction.UP,
-                                            Direction.DOWN,
-                                            Direction.LEFT,
-                                            Direction.RIGHT])
-            self.timer = self.cooldown
+        records = np.zeros(np.count_nonzero(chosen), dtype=RECORD)
+        records["x"] = xs[chosen] * cs.LEVEL_FACTOR + inset.x
+        records["y"] = ys[chosen] * cs.LEVEL_FACTOR + inset.y
+        records["direction"] = Direction.DOWN.code
+        records["timer"] = cls.initial_cooldown
 
-        proposed_disp = self.direction.value * self.speed * dt
-        actual_disp = self.check_block(proposed_disp,
-                                       coltype[CollisionType.BLOCK])
+        return records
 
-        self.check_take_damage(proposed_disp,
-                               coltype[CollisionType.TAKE_DAMAGE])
+    @classmethod
+    def from_record(cls, record: np.void, world: World) -> "Crawler":
+        """Spawn a crawler into 'world' in the state given by 'record'."""
 
-        # The displacement could be the zero vector, either because
-        # (dx, dy) is the zero tuple (because the user didn't press a
-        # key to move the player), or because the player encountered
-        # an obstacle blocking its path.
-        if actual_disp != Vector2(0, 0):
-            self.rect.move_ip(actual_disp)
-            self.animate(dt)
+        crawler = cls(0, 0, world)
+        world.unpack(crawler.index, record)
+
+        return crawler
+
+    @classmethod
+    def hunt(cls,
+             crawlers: np.ndarray,
+             target: pygame.Rect) -> tuple[np.ndarray, np.ndarray]:
+        """Return which of the given crawlers are in range to hunt down
+        'target', and the code of the direction each of them should go
+        in next, as a pair of arrays.
+
+        The way between maze cells is looked up in 'cls.field', which is
+        first led to the target's cell. Crawlers in the same cell as the
+        target head straight for it.
+
+        """
+        world = cls.world
+        field = cls.field
+
+        field.update(*cs.compute_cell_coords(
+            *cs.compute_grid_coords(*target.center)))
+
+        x, y, width, height = world.rects(crawlers)
+        center_x = x + width // 2
+        center_y = y + height // 2
+
+        cell_x, cell_y = cs.compute_cell_coords(
+            *cs.compute_grid_coords(center_x, center_y))
+        cells = cell_y * field.grid.width + cell_x
+
+        hunting = field.distances[cells] >= 0
+        directions = field.directions[cells]
+
+        up, down, left, right = (d.code for d in [Direction.UP,
+                                                  Direction.DOWN,
+                                                  Direction.LEFT,
+                                                  Direction.RIGHT])
+
+        dx = target.centerx - center_x
+        dy = target.centery - center_y
+
+        straight = np.where(np.abs(dx) >= np.abs(dy),
+                            np.where(dx < 0, left, right),
+                            np.where(dy < 0, up, down))
+        directions = np.where(field.distances[cells] == 0,
+                              straight,
+                              directions)
+
+        # The floor of a cell is two tiles wide, and so are the
+        # openings between cells. A crawler that's about to turn first
+        # lines up with the floor across its new direction, so as not
+        # to run into the pillars at the corners.
+        horizontal = (directions == left) | (directions == right)
+
+        tile_len = cs.LEVEL_FACTOR
+        low = np.where(horizontal, cell_y, cell_x) * 3 * tile_len + tile_len
+        high = low + 2 * tile_len
+
+        start = np.where(horizontal, y, x)
+        end = start + np.where(horizontal, height, width)
+
+        directions = np.where(start < low,
+                              np.where(horizontal, down, right),
+                              directions)
+        directions = np.where(end > high,
+                              np.where(horizontal, up, left),
+                              directions)
+
+        return hunting, directions
+
+    @classmethod
+    def update_all(cls,
+                   dt,
+                   coltype: dict[CollisionType, list[pygame.sprite.Group]],
+                   focus: pygame.Rect | None = None,
+                   target: pygame.Rect | None = None):
+        """Step every crawler at once, through the arrays in
+        'cls.world'.
+
+        Each crawler behaves as before: it picks a new direction at
+        random whenever its timer runs out, and moves that way unless
+        something blocks it, in which case its timer is set to run out
+        on the next step.
+
+        If 'target' is given, crawlers within 'hunt_distance' of it
+        hunt it down instead, choosing their direction every step from
+        'cls.field' (see 'hunt').
+
+        If 'focus' is given, only the crawlers overlapping it are
+        stepped every tick. The rest move at the same pace, but in
+        fewer, bigger steps, which keeps the cost of a large level
+        down. Each crawler is stepped by the time since it was last
+        stepped, as kept in the world, so one that was in focus until
+        recently only makes up for the ticks it actually missed.
+
+        A step of a tile or more could carry a crawler past a wall,
+        since only its destination is checked (see
+        'TileOccupancy.blocks_many'), so longer steps are split into
+        several shorter ones.
+
+        """
+        world = cls.world
+        crawlers = world.indices(Kind.CRAWLER)
+        world.tick += 1
+
+        if focus is not None and world.tick % cls.far_interval != 0:
+            x, y, width, height = world.rects(crawlers)
+            near = ((x < focus.right) & (focus.left < x + width)
+                    & (y < focus.bottom) & (focus.top < y + height))
+
+            crawlers = crawlers[near]
+
+        dts = (world.tick - world.stepped[crawlers]) * dt
+        world.stepped[crawlers] = world.tick
+
+        limit = (cs.LEVEL_FACTOR - 1) / np.maximum(world.speed[crawlers], 1)
+
+        while len(crawlers) > 0:
+            step_dts = np.minimum(dts, limit)
+            cls.advance(crawlers, step_dts, coltype, target)
+
+            # Crawlers can be killed partway.
+            dts -= step_dts
+            left = (dts > 0) & world.alive[crawlers]
+            crawlers, dts, limit = crawlers[left], dts[left], limit[left]
+
+    @classmethod
+    def advance(cls,
+                crawlers: np.ndarray,
+                dts: np.ndarray,
+                coltype: dict[CollisionType, list[pygame.sprite.Group]],
+                target: pygame.Rect | None):
+        """Step each crawler of world slots 'crawlers' by the matching
+        time in 'dts', as described in 'update_all'."""
+
+        world = cls.world
+        world.timer[crawlers] -= dts
+
+        # Crawlers whose timer ran out pick a new direction at random.
+        expired = crawlers[world.timer[crawlers] <= 0]
+        world.direction[expired] = world.rng.integers(len(DIRECTIONS),
+                                                      size=len(expired))
+        world.timer[expired] = world.cooldown[expired]
+
+        if target is not None and cls.field is not None:
+            hunting, directions = cls.hunt(crawlers, target)
+            world.direction[crawlers[hunting]] = directions[hunting]
+
+        proposed_disp = world.displacements(crawlers, dts)
+        x, y, width, height = world.rects(crawlers)
+
+        # Moving a rect truncates the displacement toward zero.
+        step = np.trunc(proposed_disp).astype(np.int32)
+        tentative = (x + step[:, 0], y + step[:, 1], width, height)
+
+        blocked = np.zeros(len(crawlers), dtype=np.bool_)
+
+        for obstacles in coltype[CollisionType.BLOCK]:
+            blocked |= colliding_many(tentative, obstacles, crawlers)
+
+        # The displacement could also be the zero vector.
+        moving = ~blocked & proposed_disp.any(axis=1)
+
+        # Crawlers used to move one at a time, so that none could move
+        # into a space another one had just moved into. Since they now
+        # all move at once, of two crawlers whose tentative positions
+        # overlap, the one later in the world's arrays is blocked
+        # instead. (Blocking both could leave two hunting crawlers
+        # blocking each other for good. As in 'check_block', crawlers
+        # with identical rects don't count.)
+        movers = np.flatnonzero(moving)
+        moving_rects = tuple(v[movers] for v in tentative)
+        i, j = overlap_pairs(moving_rects, moving_rects)
+
+        same = ((x[movers[i]] == x[movers[j]])
+                & (y[movers[i]] == y[movers[j]]))
+        moving[movers[i[(i > j) & ~same]]] = False
+
+        damaged = np.zeros(len(crawlers), dtype=np.bool_)
+
+        for obstacles in coltype[CollisionType.TAKE_DAMAGE]:
+            damaged |= colliding_many(tentative, obstacles)
+
+        moved = crawlers[moving]
+        world.x[moved] = tentative[0][moving]
+        world.y[moved] = tentative[1][moving]
+        cls.group.moved(moved)
+        world.timer[crawlers[~moving]] = 0
+
+        # All crawlers share the same number of animation frames.
+        world.animate(moved, dts[moving], speed=5, frames=2)
+
+        for slot in crawlers[damaged]:
+            cls.kill(cls.group.by_index[int(slot)])
+
+
+# The floor, pillars and stairs never move, so they're drawn once onto
+# chunks of a shared background instead of every frame.
+background = Background()
+
+# Times the phases of each frame, if profiling is on (see profiler.py).
+profiler: FrameProfiler | NullProfiler = NullProfiler()
+
+
+def active_area(view: pygame.Rect) -> pygame.Rect:
+    """Return the part of the level that's kept in play around 'view',
+    in pixels: the view itself, plus a chunk on every side.
+
+    Chunks in the active area are materialized, and crawlers in it are
+    stepped every tick.
+
+    """
+    margin = 2 * cs.CHUNK_LEN * cs.LEVEL_FACTOR
+
+    return view.inflate(margin, margin)
+
+
+class Chunks:
+    """The chunks of a level whose tiles and crawlers exist as sprites.
+
+    A chunk is materialized once the player comes near it, so the
+    number of sprites doesn't grow with the size of the level. When
+    more than 'capacity' chunks are materialized, the least recently
+    used ones are evicted. Their fixture sprites are dropped, and their
+    crawlers are packed into compact world records, which they're
+    spawned back from when the chunk is materialized again.
+
+    Fields:
+
+    tiles: The tile map of the whole level.
+
+    world: The level's world, which crawlers are spawned into.
+
+    crawlers, stairs: The level's groups of crawlers and stairs in
+    play.
+
+    fixtures: The fixture sprites of each materialized chunk, least
+    recently used first.
+
+    materialized: Whether each chunk is materialized, indexed by chunk
+    row and column.
+
+    records: The crawlers of each chunk that isn't materialized.
+
+    capacity: How many chunks can be materialized at once.
+
+    """
+    def __init__(self,
+                 tiles: maze.TileMap,
+                 world: World,
+                 crawlers: EntityGroup,
+                 stairs: pygame.sprite.Group,
+                 records: np.ndarray,
+                 capacity: int = 64):
+        self.tiles = tiles
+        self.world = world
+        self.crawlers = crawlers
+        self.stairs = stairs
+        self.capacity = capacity
+
+        self.fixtures: OrderedDict[Point, pygame.sprite.Group] = OrderedDict()
+
+        columns = -(-tiles.width // cs.CHUNK_LEN)
+        rows = -(-tiles.height // cs.CHUNK_LEN)
+        self.materialized = np.zeros((rows, columns), dtype=np.bool_)
+
+        # Sort the records into chunks.
+        self.records: dict[Point, np.ndarray] = {}
+
+        if len(records) == 0:
+            return
+
+        size = cs.CHUNK_LEN * cs.LEVEL_FACTOR
+        keys = (records["y"] // size) * columns + records["x"] // size
+
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))
+
+        for key, chunk_records in zip(keys[starts],
+                                      np.split(records[order], starts[1:])):
+            cy, cx = divmod(int(key), columns)
+            self.records[cx, cy] = chunk_records
+
+    def materialize(self, chunk: Point) -> None:
+        """Create the sprites of the tiles and crawlers in 'chunk'."""
+
+        cx, cy = chunk
+        tile_map = self.tiles.crop(cx * cs.CHUNK_LEN,
+                                   cy * cs.CHUNK_LEN,
+                                   cs.CHUNK_LEN,
+                                   cs.CHUNK_LEN)
+
+        stairs = StairsUp.from_tiles(tile_map)
+
+        self.fixtures[chunk] = pygame.sprite.Group(Pillar.from_tiles(tile_map),
+                                                   Floor.from_tiles(tile_map),
+                                                   stairs)
+        self.stairs.add(stairs)
+        self.materialized[cy, cx] = True
+
+        for record in self.records.pop(chunk, []):
+            self.crawlers.add(Crawler.from_record(record, self.world))
+
+    def evict(self, chunk: Point) -> None:
+        """Drop the fixture sprites of 'chunk'.
+
+        Its crawlers are packed by the next call to 'pack_strays'.
+
+        """
+        cx, cy = chunk
+
+        for fixture in self.fixtures.pop(chunk):
+            if isinstance(fixture, StairsUp):
+                self.stairs.remove(fixture)
+
+        self.materialized[cy, cx] = False
+
+    def pack_strays(self) -> None:
+        """Pack every crawler in play that's in a chunk that isn't
+        materialized, whether the chunk was just evicted or the crawler
+        wandered off into it."""
+
+        slots = self.world.indices(Kind.CRAWLER)
+        x, y, _, _ = self.world.rects(slots)
+
+        size = cs.CHUNK_LEN * cs.LEVEL_FACTOR
+        cx, cy = x // size, y // size
+
+        stray = ~self.materialized[cy, cx]
+
+        for slot, chunk_x, chunk_y in zip(slots[stray], cx[stray], cy[stray]):
+            chunk = int(chunk_x), int(chunk_y)
+            record = self.world.pack(np.array([slot]))
+
+            if chunk in self.records:
+                record = np.concatenate([self.records[chunk], record])
+
+            self.records[chunk] = record
+            self.crawlers.remove(self.crawlers.by_index[int(slot)])
+
+    def update(self, area: pygame.Rect) -> None:
+        """Materialize every chunk overlapping 'area', in pixels, evict
+        the least recently used chunks beyond 'capacity', and pack any
+        crawlers that are no longer in a materialized chunk."""
+
+        rows, columns = self.materialized.shape
+
+        for chunk in chunks_within(area):
+            cx, cy = chunk
+
+            if not (0 <= cx < columns and 0 <= cy < rows):
+                continue
+
+            if chunk in self.fixtures:
+                self.fixtures.move_to_end(chunk)
+            else:
+                self.materialize(chunk)
+
+        while len(self.fixtures) > self.capacity:
+            self.evict(next(iter(self.fixtures)))
+
+        self.pack_strays()
+
+
+class Level:
+    """A level of the dungeon, built and ready to be entered.
+
+    Each field takes the place of the class attribute of the same
+    purpose (e.g. 'StairsUp.group') while the level is played.
+
+    Fields:
+
+    stairs: The group of the level's stairs in play.
+
+    occupancy: The solid tiles of the level.
+
+    field: The way to the player through the level's maze.
+
+    world: The level's moving entities.
+
+    crawlers, player: The groups of the level's moving sprites.
+
+    chunks: The level's materialized chunks.
+
+    surfaces: The chunks in view when the level is entered, rendered
+    ahead of time.
+
+    """
+    def __init__(self,
+                 cells: bytearray,
+                 tile_map: maze.TileMap,
+                 seed: int | list[int] | None = None):
+        """Build a level from its maze's cells, row by row, and its tile
+        map (see 'maze.rasterize_level').
+
+        'seed' seeds the level's world, which places the crawlers and
+        decides where they wander. A level built from the same maze and
+        seed always plays out the same way, given the same input.
+
+        Only a byte or two per tile and per maze cell, and a record per
+        crawler, are kept for the whole level. Sprites are only created
+        for the chunks around the player (see 'Chunks').
+
+        Nothing outside the new level is touched, so levels can be
+        built in a worker thread while another level is being played.
+
+        """
+        self.stairs = pygame.sprite.Group()
+        self.occupancy = TileOccupancy(tile_map.width, tile_map.height)
+        self.occupancy.fill(tile_map)
+        self.world = World(seed=seed)
+        self.crawlers = EntityGroup(self.world, Kind.CRAWLER)
+
+        grid = maze.Grid(cs.GRID_X, cs.GRID_Y)
+        grid.cells = cells
+        self.field = FlowField(grid, Crawler.hunt_distance)
+
+        self.chunks = Chunks(tile_map,
+                             self.world,
+                             self.crawlers,
+                             self.stairs,
+                             Crawler.initial_records(tile_map,
+                                                     self.world.rng))
+
+        player = Player(1, 1, self.world)
+        self.player = pygame.sprite.GroupSingle(player)
+
+        view = Camera(*cs.compute_view_size())
+        view.follow(player.rect)
+
+        self.chunks.update(active_area(view.rect))
+
+        self.surfaces = {
+            chunk: render_chunk(chunk,
+                                self.chunks.fixtures.get(
+                                    chunk, pygame.sprite.Group()))
+            for chunk in chunks_within(view.rect)
+        }
+
+    @classmethod
+    def from_strips(cls,
+                    strips: Iterable[maze.Strip],
+                    seed: int | list[int] | None = None) -> "Level":
+        """Build a level from 'strips', the rows of its maze, e.g. as
+        read from a level file."""
+
+        return cls(*maze.rasterize_level(strips), seed)
+
+
+def enter_level(level: Level) -> None:
+    """Put 'level' in play, in place of the current one.
+
+    Since the level comes with its own groups and world, this only
+    swaps references, no matter how big the level is.
+
+    """
+    StairsUp.group = level.stairs
+    Pillar.occupancy = level.occupancy
+    Moving.world = level.world
+    Crawler.group = level.crawlers
+    Crawler.field = level.field
+    Player.group = level.player
+    Player.sword_group.empty()
+
+    background.set(level.chunks.fixtures, level.surfaces)
+
+
+class Dungeon:
+    """A stack of levels, climbed by way of each level's stairs.
+
+    While a level is played, the next one is built in the background,
+    so that climbing the stairs only has to swap it in. Carving and
+    rasterizing its maze is pure Python, which would hold the GIL
+    against the game loop on a thread, so that's done by a worker
+    process. Only the level's sprites are then set up by a worker
+    thread, since they can't leave this process.
+
+    Fields:
+
+    carve: Carve and rasterize the maze of a new level, given its seed
+    (see 'maze_seed'). It's run in the worker process, so it must be
+    picklable, e.g. a 'functools.partial' of 'generators.carve_level'.
+
+    levels: How many levels there are. Reaching the stairs of the last
+    one wins the game.
+
+    seed: Seeds each level's maze and world along with the level's
+    depth, if given (see 'Level').
+
+    depth: The number of the current level, counting from 1.
+
+    level: The current level.
+
+    processes, threads: Run the worker process and thread.
+
+    upcoming: The next level, as it's being built, or None if this is
+    the last level.
+
+    """
+    def __init__(self,
+                 carve: Callable[[int | None],
+                                 tuple[bytearray, maze.TileMap]],
+                 levels: int,
+                 seed: int | None = None):
+        self.carve = carve
+        self.levels = levels
+        self.seed = seed
+        self.depth = 0
+        self.level: Level | None = None
+
+        # The worker process imports this module again, and with it
+        # pygame, which would print its banner a second time.
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        self.processes = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"))
+        self.threads = ThreadPoolExecutor(max_workers=1,
+                                          thread_name_prefix="level")
+        self.upcoming: Future[Level] | None = None
+
+    def start(self, strips: Iterable[maze.Strip] | None = None) -> None:
+        """Enter the first level, building it on the spot.
+
+        The level is built from 'strips' if given, e.g. to play a level
+        loaded from a file, or else from a new maze.
+
+        """
+        self.depth = 1
+
+        if strips is None:
+            level = Level(*self.carve(self.maze_seed(1)), self.level_seed(1))
         else:
-            self.timer = 0
+            level = Level.from_strips(strips, self.level_seed(1))
 
+        self.enter(level)
+        self.prepare_next()
 
-def mainloop() -> None:
-    """The main pygame loop.
+    def maze_seed(self, depth: int) -> int | None:
+        if self.seed is None:
+            return None
 
-    The loop is encapsulated inside this function so that we can easily
-    quit the game with a 'return' statement.
+        # --levels is checked to be less than 2**16.
+        return self.seed << 16 | depth
+
+    def level_seed(self, depth: int) -> list[int] | None:
+        if self.seed is None:
+            return None
+
+        return [self.seed, depth]
+
+    def prepare_next(self) -> None:
+        if self.depth < self.levels:
+            depth = self.depth + 1
+            carved = self.processes.submit(self.carve, self.maze_seed(depth))
+            seed = self.level_seed(depth)
+
+            self.upcoming = self.threads.submit(
+                lambda: Level(*carved.result(), seed))
+        else:
+            self.upcoming = None
+
+    def climb(self) -> bool:
+        """Enter the next level, and return whether there was one.
+
+        If the next level hasn't been built yet, this waits for it.
+
+        """
+        if self.upcoming is None:
+            return False
+
+        self.depth += 1
+        self.enter(self.upcoming.result())
+        self.prepare_next()
+
+        return True
+
+    def enter(self, level: Level) -> None:
+        self.level = level
+        enter_level(level)
+
+    def close(self) -> None:
+        self.processes.shutdown(cancel_futures=True)
+        self.threads.shutdown(cancel_futures=True)
+
+
+# The most time a single frame can add to the game logic, in seconds.
+MAX_FRAME_TIME = 0.25
+
+
+def step(dt: float) -> Outcome | None:
+    """Advance the game logic by 'dt' seconds.
+
+    Return how the game ended, or None if it's still going.
+
+    Crawlers outside the active area around the camera are stepped
+    less often (see 'Crawler.update_all'), and the chunks in it are
+    materialized (see 'Chunks').
+
+    Where every moving sprite was before the tick is remembered, to
+    draw it in between (see 'World.snapshot').
 
     """
-    clock = pygame.time.Clock()
-    dt = 0.0
+    Moving.world.snapshot()
+
+    with profiler.phase("player"):
+        Player.group.update(dt, {
+            CollisionType.BLOCK: [Pillar.occupancy],
+            CollisionType.TAKE_DAMAGE: [Crawler.group],
+            CollisionType.WIN: [StairsUp.group]
+        })
+
+    player = Player.group.sprite
+    target = player.rect if player is not None else None
+
+    with profiler.phase("crawlers"):
+        Crawler.update_all(dt, {
+            CollisionType.BLOCK: [Crawler.group, Pillar.occupancy],
+            CollisionType.TAKE_DAMAGE: [Player.sword_group],
+        }, focus=active_area(camera.rect), target=target)
+
+    if Player.group.sprite is None:
+        return Outcome.DIED
+
+    if Player.group.sprite.won and not dungeon.climb():
+        return Outcome.WON
 
-    # Use a set, so that we can remove duplicates (we don't add a pillar
-    # twice to a given board position.)
-    occupied_positions: set[Point] = set()
+    camera.follow(Player.group.sprite.rect)
 
-    Pillar.spawn_tiles(occupied_positions)
-    Floor.spawn_tiles(occupied_positions)
-    Crawler.spawn_crawlers(occupied_positions)
-    Player.spawn(1, 1)
-    StairsUp(cs.NUM_TILES_X - 2, cs.NUM_TILES_Y - 2)
+    with profiler.phase("chunks"):
+        dungeon.level.chunks.update(active_area(camera.rect))
 
-    while True:
+    return None
+
+
+def end_frame() -> None:
+    """Count what's in play, and end the frame in the profiler."""
+
+    profiler.count("crawlers", len(Crawler.group))
+    profiler.count("collision tests", collision.tests)
+    collision.tests = 0
+
+    profiler.end_frame()
+
+
+def quit_requested() -> bool:
+    """Handle the pending events, and return whether the player asked
+    to quit."""
+
+    with profiler.phase("events"):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                return
+                return True
 
             if event.type == pygame.KEYDOWN:
                 match event.key:
                     case pygame.K_ESCAPE:
-                        return
+                        return True
 
-        # Important: this prevents moving, animated sprites from
-        # leaving streaks.
-        screen.fill(pygame.Color("black"))
+    return False
 
-        Pillar.group.draw(screen)
-        Floor.group.draw(screen)
-        Player.group.draw(screen)
-        Crawler.group.draw(screen)
-        Player.sword_group.draw(screen)
-        StairsUp.group.draw(screen)
 
-        Player.group.update(dt, {
-            CollisionType.BLOCK: [Pillar.group],
-            CollisionType.TAKE_DAMAGE: [Crawler.group],
-            CollisionType.WIN: [StairsUp.group]
-        })
+class Frames:
+    """Run the game logic in fixed ticks, and draw frames in between.
 
-        Crawler.group.update(dt, {
-            CollisionType.BLOCK: [Crawler.group, Pillar.group],
-            CollisionType.TAKE_DAMAGE: [Player.sword_group],
-        })
+    The game logic always advances in ticks of 'dt' seconds, however
+    long frames take: the time each frame took is added up, and as many
+    ticks are run as fit in it, with the remainder carried over to the
+    next frame. On a slow machine several ticks are run per frame, and
+    on a fast one some frames run none, but the game plays out the same
+    either way. Sprites are drawn between where they were before the
+    last tick and where they are now, in proportion to the time left
+    over, so that they move smoothly whatever the frame rate.
 
-        if Player.group.sprite is None:
-            print("You died!")
-            return
+    Fields:
 
-        if Player.group.sprite.won:
-            print("You won!")
-            return
+    renderer: Draws each frame.
+
+    dt: The length of a tick, in seconds.
+
+    view: What's drawn. 'camera' follows the player from tick to tick,
+    for the game logic; 'view' follows where the player is drawn.
+
+    accumulator: The time that's passed but not yet ticked, in seconds.
+
+    ticks: The number of ticks run so far.
+
+    """
+    def __init__(self, renderer: FullRenderer | DirtyRenderer, dt: float):
+        self.renderer = renderer
+        self.dt = dt
+        self.view = Camera(*screen.get_size())
+        self.view.rect = camera.rect.copy()
+        self.accumulator = 0.0
+        self.ticks = 0
+
+    def advance(self, elapsed: float) -> Outcome | None:
+        """Run the ticks that fit in the 'elapsed' seconds since the
+        last frame, as well as the time left over, and draw a frame.
+
+        Return how the game ended, or None if it's still going.
+
+        """
+        # After a long stall, e.g. while the window was being dragged,
+        # drop the time lost rather than trying to catch up on it all
+        # at once.
+        self.accumulator += min(elapsed, MAX_FRAME_TIME)
+        ticks = 0
+
+        while self.accumulator >= self.dt:
+            outcome = step(self.dt)
+            self.accumulator -= self.dt
+            self.ticks += 1
+            ticks += 1
+
+            if outcome is not None:
+                return outcome
+
+        alpha = self.accumulator / self.dt
+        player = Player.group.sprite
+
+        if player is not None:
+            self.view.follow(player.interpolated_rect(alpha))
+
+        self.renderer.render(screen, self.view, [Player.group,
+                                                 Crawler.group,
+                                                 Player.sword_group],
+                             alpha)
+
+        profiler.count("ticks", ticks)
+        end_frame()
+
+        return None
+
+
+def mainloop(renderer: FullRenderer | DirtyRenderer, dt: float) -> int:
+    """The main pygame loop. Return the number of ticks the game logic
+    was advanced by.
+
+    The loop is encapsulated inside this function so that we can easily
+    quit the game with a 'return' statement.
+
+    Frames are paced to 60 per second, and the game logic is run in
+    ticks of 'dt' seconds in between (see 'Frames').
+
+    """
+    clock = pygame.time.Clock()
+    frames = Frames(renderer, dt)
+
+    while not quit_requested():
+        with profiler.phase("wait"):
+            elapsed = clock.tick(60) / 1000
+
+        outcome = frames.advance(elapsed)
+
+        if outcome is not None:
+            print(outcome.value)
+            break
+
+    return frames.ticks
+
+
+async def async_mainloop(renderer: FullRenderer | DirtyRenderer,
+                         dt: float) -> int:
+    """The main pygame loop, as a coroutine, paced like 'mainloop'.
+
+    Instead of blocking until the next frame is due, the loop awaits
+    it, so that other tasks, such as the services in services.py, run
+    while it waits.
+
+    """
+    frame_time = 1 / 60
+    frames = Frames(renderer, dt)
+    last = time.perf_counter()
+    due = last
+
+    while not quit_requested():
+        with profiler.phase("wait"):
+            due += frame_time
+            delay = due - time.perf_counter()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Running late: start afresh from now, rather than
+                # rushing the next frames, but still let the other
+                # tasks run.
+                due = time.perf_counter()
+                await asyncio.sleep(0)
+
+            now = time.perf_counter()
+            elapsed = now - last
+            last = now
+
+        outcome = frames.advance(elapsed)
+
+        if outcome is not None:
+            print(outcome.value)
+            break
+
+    return frames.ticks
 
-        pygame.display.flip()
 
-        dt = clock.tick(60) / 1000
+async def play(renderer: FullRenderer | DirtyRenderer,
+               dt: float,
+               tasks: list[Coroutine]) -> int:
+    """Run 'async_mainloop' as a task, and 'tasks', e.g. the services in
+    services.py, alongside it until it's done. Return the number of
+    ticks run.
+
+    If a service fails, the game stops with its exception.
+
+    """
+    async with asyncio.TaskGroup() as group:
+        running = [group.create_task(task) for task in tasks]
+        ticks = await group.create_task(async_mainloop(renderer, dt))
+
+        for task in running:
+            task.cancel()
+
+    return ticks
+
+
+def headless_loop(ticks: int, dt: float) -> int:
+    """Run the game logic for up to 'ticks' ticks of 'dt' seconds each,
+    as fast as possible, without drawing or handling events. Return the
+    number of ticks run.
+
+    The player's input comes from 'Player.controls'.
+
+    """
+    start = time.perf_counter()
+    outcome = None
+    tick = 0
+
+    while tick < ticks and outcome is None:
+        outcome = step(dt)
+        tick += 1
+
+        end_frame()
+
+    elapsed = time.perf_counter() - start
+
+    # A run of no ticks, e.g. with '--ticks 0', can take no measurable
+    # time at all.
+    print(f"Ran {tick} ticks in {elapsed:.3f}s "
+          f"({tick / max(elapsed, 1e-9):.0f} ticks/s, "
+          f"level {dungeon.depth}, "
+          f"{len(Crawler.group)} crawlers left)")
+
+    if outcome is not None:
+        print(outcome.value)
+
+    return tick
+
+
+def state_digest() -> bytes:
+    """Return a digest of the state of the game, to check that a replay
+    went exactly the same way as the game it was recorded from."""
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(dungeon.depth.to_bytes(4, "little"))
+
+    world = Moving.world
+
+    for name in World.FIELDS:
+        digest.update(getattr(world, name)[:world.count].tobytes())
+
+    # The crawlers of the chunks that aren't materialized, too.
+    records = dungeon.level.chunks.records
+
+    for chunk in sorted(records):
+        digest.update(repr(chunk).encode())
+        digest.update(records[chunk].tobytes())
+
+    return digest.digest()
 
 
 if __name__ == "__main__":
@@ -474,19 +1421,273 @@ if __name__ == "__main__":
     # Note that the scale factor must be an integer.
     parser = argparse.ArgumentParser()
     parser.add_argument("-s", "--scale-factor", nargs="?", default=1, type=int)
+    parser.add_argument("-a", "--algorithm",
+                        choices=generators.GENERATORS.keys(),
+                        default="hunt-and-kill")
+    parser.add_argument("--grid-size",
+                        nargs=2,
+                        type=int,
+                        metavar=("WIDTH", "HEIGHT"),
+                        help="the size of the maze of each level, in cells "
+                        f"(default: {cs.GRID_X} {cs.GRID_Y})")
+    parser.add_argument("--load",
+                        metavar="FILE",
+                        help="play the level saved in FILE first, instead "
+                        "of a new one")
+    parser.add_argument("--save",
+                        metavar="FILE",
+                        help="save the first level to FILE")
+    parser.add_argument("--levels",
+                        default=3,
+                        type=int,
+                        help="the number of levels to climb to win")
+    parser.add_argument("--dirty-rects",
+                        action="store_true",
+                        help="only redraw the parts of the screen where "
+                        "sprites moved, instead of the whole screen")
+    parser.add_argument("--headless",
+                        action="store_true",
+                        help="run the game logic without a display, at a "
+                        "fixed timestep, as fast as possible")
+    parser.add_argument("--ticks",
+                        default=3600,
+                        type=int,
+                        help="the number of ticks to run for when headless")
+    parser.add_argument("--dt",
+                        default=1/60,
+                        type=float,
+                        help="the length of a tick in seconds")
+    parser.add_argument("--script",
+                        help="read the player's input from this script "
+                        "instead of the keyboard (see controls.py)")
+    parser.add_argument("--seed",
+                        type=cs.parse_seed,
+                        help="seed the mazes and the crawlers, so that the "
+                        "game plays out the same way given the same input")
+    parser.add_argument("--record",
+                        metavar="FILE",
+                        help="record the game to FILE, to be played again "
+                        "with --replay")
+    parser.add_argument("--replay",
+                        metavar="FILE",
+                        help="play the game recorded in FILE again, "
+                        "headless and as fast as possible, and check that "
+                        "it ends the same way")
+    parser.add_argument("--profile",
+                        action="store_true",
+                        help="time each phase of every frame, and print "
+                        "the percentiles at the end")
+    parser.add_argument("--profile-overlay",
+                        action="store_true",
+                        help="show the frame timings on screen (implies "
+                        "--profile)")
+    parser.add_argument("--profile-export",
+                        metavar="FILE",
+                        help="write every frame's timings to FILE, as JSON "
+                        "lines if it ends in .jsonl and as CSV otherwise "
+                        "(implies --profile)")
+    parser.add_argument("--cprofile",
+                        metavar="FILE",
+                        help="run cProfile over the first frames, and write "
+                        "the statistics to FILE")
+    parser.add_argument("--cprofile-frames",
+                        default=600,
+                        type=int,
+                        help="the number of frames to run cProfile over")
+    parser.add_argument("--async-loop",
+                        action="store_true",
+                        help="run the game loop with asyncio, saving the "
+                        "recording and the profile export so far in the "
+                        "background as it goes")
+    parser.add_argument("--autosave",
+                        default=services.INTERVAL,
+                        type=float,
+                        metavar="SECONDS",
+                        help="how often the asyncio loop saves the "
+                        "recording and the profile export so far")
     args = parser.parse_args()
 
+    if args.replay:
+        if args.load or args.script or args.record:
+            parser.error("--replay can't be combined with --load, --script "
+                         "or --record")
+
+        replay = Replay.load(args.replay)
+
+        args.seed = replay.seed
+        args.dt = replay.dt
+        args.grid_size = [replay.width, replay.height]
+        args.levels = replay.levels
+        args.scale_factor = replay.scale_factor
+        args.algorithm = replay.algorithm
+        args.headless = True
+        args.ticks = replay.ticks
+
+    if args.record:
+        if args.load:
+            parser.error("a game on a loaded level can't be recorded")
+
+        if args.seed is None:
+            args.seed = random.randrange(1 << 63)
+
+    # Each level's depth takes up the low 16 bits of its maze's seed (see
+    # 'Dungeon.maze_seed'), and replays hold the number of levels in as
+    # many.
+    if not 1 <= args.levels < 1 << 16:
+        parser.error(f"--levels must be at least 1 and less than "
+                     f"{1 << 16}, not {args.levels}")
+
+    # Level files and replays hold each side of the maze in 32 bits (see
+    # 'levelfile.HEADER' and 'replay.HEADER').
+    if args.grid_size and not all(1 <= n < 1 << 32 for n in args.grid_size):
+        parser.error(f"--grid-size must be at least 1 and less than "
+                     f"{1 << 32} each way, not "
+                     f"{' by '.join(map(str, args.grid_size))}")
+
+    if args.headless:
+        # Sprite surfaces still need a display to be converted for, so
+        # use one that doesn't show anything.
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+
     pygame.init()
     cs.configure_scale_factor(args.scale_factor)
 
-    screen_dimensions = cs.compute_pixel_coords(cs.NUM_TILES_X, cs.NUM_TILES_Y)
-    screen = pygame.display.set_mode(screen_dimensions)
+    # Crawlers split long steps up, but the player moves a whole tick at
+    # a time, and a step of a tile or more could carry it past a wall.
+    max_dt = (cs.LEVEL_FACTOR - 1) / Player.base_speed
+
+    if not 0 < args.dt <= max_dt:
+        parser.error(f"--dt must be more than 0 and at most {max_dt:.4f} "
+                     f"seconds at scale factor {cs.SCALE_FACTOR}, or the "
+                     f"player could step through walls")
+
+    if args.grid_size:
+        cs.configure_grid_size(*args.grid_size)
+
+    # A loaded level decides the size of every level after it.
+    if args.load:
+        level_file = levelfile.LevelFile(args.load)
+        cs.configure_grid_size(level_file.width, level_file.height)
+
+    # The screen shows as much of the level as fits, and the camera
+    # follows the player around the rest.
+    screen = pygame.display.set_mode(cs.compute_view_size())
+    camera = Camera(*screen.get_size())
 
     dir_path = os.path.dirname(os.path.realpath(__file__))
     sheet = Spritesheet(f"{dir_path}/../graphics/spritesheet.png")
 
-    grid = maze.Grid(cs.GRID_X, cs.GRID_Y)
-    grid.carve()
+    # Each level's maze is carved from a seed of its own (see
+    # 'Dungeon.maze_seed'), in whatever process builds it.
+    carve = functools.partial(generators.carve_level,
+                              cs.GRID_X,
+                              cs.GRID_Y,
+                              args.algorithm)
+    dungeon = Dungeon(carve, args.levels, args.seed)
+
+    if args.load:
+        first_strips = level_file.strips()
+    elif args.save:
+        first_strips = generators.level_strips(cs.GRID_X,
+                                               cs.GRID_Y,
+                                               args.algorithm,
+                                               dungeon.maze_seed(1))
+    else:
+        first_strips = None
+
+    if args.save:
+        first_strips = list(first_strips)
+        levelfile.save(args.save, first_strips, cs.GRID_X, cs.GRID_Y)
+
+    dungeon.start(first_strips)
+    camera.follow(Player.group.sprite.rect)
+
+    if args.load:
+        level_file.close()
+
+    if args.script:
+        Player.controls = ScriptedControls.load(args.script)
+
+    if args.replay:
+        Player.controls = ScriptedControls.from_masks(replay.masks)
+
+    if args.record:
+        replay = Replay(args.seed,
+                        args.dt,
+                        cs.GRID_X,
+                        cs.GRID_Y,
+                        args.levels,
+                        cs.SCALE_FACTOR,
+                        args.algorithm)
+        Player.controls = RecordingControls(Player.controls, replay.masks)
+
+    overlays = []
+
+    if (args.profile or args.profile_overlay or args.profile_export
+            or args.cprofile):
+        profiler = FrameProfiler(keep_frames=bool(args.profile_export))
+
+    if args.profile_export:
+        export = Export(args.profile_export)
+
+    if args.profile_overlay:
+        overlays.append(Overlay(profiler))
+
+    if args.cprofile:
+        profiler.start_capture(args.cprofile, args.cprofile_frames)
+
+    if args.headless:
+        ticks = headless_loop(args.ticks, args.dt)
+    else:
+        if args.dirty_rects:
+            renderer = DirtyRenderer(background, profiler, overlays)
+        else:
+            renderer = FullRenderer(background, profiler, overlays)
+
+        if args.async_loop:
+            background_services = []
+
+            if args.record:
+                background_services.append(
+                    autosave(replay, args.record, args.autosave))
+
+            if args.profile_export:
+                background_services.append(
+                    export_telemetry(profiler, export, args.autosave))
 
-    mainloop()
+            ticks = asyncio.run(play(renderer, args.dt, background_services))
+        else:
+            ticks = mainloop(renderer, args.dt)
+
+    profiler.close()
+
+    if args.profile or args.profile_overlay or args.profile_export:
+        print("\n".join(profiler.report()))
+
+    if args.profile_export:
+        export.write(profiler.take_frames())
+        export.finish(profiler.summary())
+
+    diverged = False
+
+    if args.record:
+        replay.ticks = ticks
+        replay.digest = state_digest()
+        replay.save(args.record)
+
+    if args.replay and replay.digest is None:
+        print("The recording was cut short, so there's no end state to "
+              "check the replay against")
+    elif args.replay:
+        diverged = (ticks, state_digest()) != (replay.ticks, replay.digest)
+
+        if diverged:
+            print("The replay diverged from the recording")
+        else:
+            print("The replay matches the recording")
+
+    dungeon.close()
     pygame.quit()
+
+    if diverged:
+        sys.exit(1)
@@ -1,5 +1,7 @@
-from enum import Flag, auto
+from enum import Flag, IntEnum, auto
+import heapq
 import random
+from collections.abc import Iterable, Iterator
 from typedefs import Point
 
 
@@ -23,6 +25,13 @@ class Cell(Flag):
         return not self.unvisited()
 
 
+# Raw direction bits, as stored in 'Grid.cells'.
+_UP = Cell.UP.value
+_DOWN = Cell.DOWN.value
+_LEFT = Cell.LEFT.value
+_RIGHT = Cell.RIGHT.value
+
+
 def get_neighbors(x, y, xmax, ymax) -> list[Point]:
     """Return the list of taxicab neighbors of the given point, with
     bounds checking.
@@ -31,39 +40,77 @@ def get_neighbors(x, y, xmax, ymax) -> list[Point]:
 
     neighbors: list[Point] = []
 
-    for dx in [-1, 0, 1]:
-        for dy in [-1, 0, 1]:
-            # Exactly one of these has to be 0 for taxicab adjacency.
-            if (dx == 0) ^ (dy == 0):
-                new_x = x + dx
-                new_y = y + dy
+    # Listed in the same order as a sweep over dx, then dy, would give.
+    if x > 0:
+        neighbors.append((x - 1, y))
 
-                x_valid = new_x in range(xmax)
-                y_valid = new_y in range(ymax)
+    if y > 0:
+        neighbors.append((x, y - 1))
 
-                if x_valid and y_valid:
-                    neighbors.append((new_x, new_y))
+    if y < ymax - 1:
+        neighbors.append((x, y + 1))
+
+    if x < xmax - 1:
+        neighbors.append((x + 1, y))
 
     return neighbors
 
 
 class Grid:
-    def __init__(self, width, height):
-        self.grid = []
-        self.width = width
-        self.height = height
+    """A maze grid, stored as a flat array of direction bits.
 
-        for i in range(width):
-            self.grid.append([])
+    Each cell takes up a single byte holding the value of its 'Cell'
+    flag. Cells are laid out row by row, so that the cell at (x, y)
+    lives at index 'y * width + x' of 'self.cells'.
 
-            for j in range(height):
-                self.grid[-1].append(Cell(0))
+    'Cell' is still the public view of a cell; use 'cell' to read one.
 
-    def tour(self, x_start, y_start) -> None:
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+
+        # Min-heap of indices of unvisited cells that have been seen
+        # next to a visited one. Entries are never removed eagerly, so
+        # a popped index may turn out to be visited already.
+        self.frontier: list[int] = []
+
+    def cell(self, x, y) -> Cell:
+        """Return the cell at (x, y) as a 'Cell' flag."""
+        return Cell(self.cells[y * self.width + x])
+
+    def visited(self, x, y) -> bool:
+        return self.cells[y * self.width + x] != 0
+
+    def link(self, x, y, new_x, new_y) -> None:
+        """Open the wall between (x, y) and the adjacent cell (new_x,
+        new_y), on both sides."""
+
+        here = y * self.width + x
+        there = new_y * self.width + new_x
+
+        if new_x < x:
+            self.cells[here] |= _LEFT
+            self.cells[there] |= _RIGHT
+        elif new_x > x:
+            self.cells[here] |= _RIGHT
+            self.cells[there] |= _LEFT
+
+        if new_y < y:
+            self.cells[here] |= _UP
+            self.cells[there] |= _DOWN
+        elif new_y > y:
+            self.cells[here] |= _DOWN
+            self.cells[there] |= _UP
+
+    def tour(self, x_start, y_start, rng: random.Random) -> None:
         """Attempt to perform a random walk around 'grid', until all paths
         forward lead either to a visited cell, or would take us
         out-of-bounds.
 
+        The walk's random choices are made with 'rng'.
+
         """
 
         # Initialize x and y for the following loop.
@@ -78,29 +125,22 @@ class Grid:
 
             def not_yet_visited(p: Point) -> bool:
                 x, y = p
-                return self.grid[x][y].unvisited()
+                return not self.visited(x, y)
 
             neighbors = list(filter(not_yet_visited, neighbors))
 
+            # Everything we didn't walk into here is a candidate for
+            # the hunt phase later on.
+            for xn, yn in neighbors:
+                heapq.heappush(self.frontier, yn * self.width + xn)
+
             if neighbors == []:
                 return
             else:
                 # Choose a neighbor at random.
-                new_x, new_y = random.choice(neighbors)
-
-                if new_x < x:
-                    self.grid[x][y] |= Cell.LEFT
-                    self.grid[new_x][new_y] |= Cell.RIGHT
-                elif new_x > x:
-                    self.grid[x][y] |= Cell.RIGHT
-                    self.grid[new_x][new_y] |= Cell.LEFT
-
-                if new_y < y:
-                    self.grid[x][y] |= Cell.UP
-                    self.grid[new_x][new_y] |= Cell.DOWN
-                elif new_y > y:
-                    self.grid[x][y] |= Cell.DOWN
-                    self.grid[new_x][new_y] |= Cell.UP
+                new_x, new_y = rng.choice(neighbors)
+
+                self.link(x, y, new_x, new_y)
 
                 x, y = new_x, new_y
 
@@ -108,29 +148,51 @@ class Grid:
         """Find the first Point p such that:
 
         1. The grid cell there is unvisited.
-        2. The grid cell is adjacent to a visited cell."""
-        for x in range(self.width):
-            for y in range(self.height):
-                if self.grid[x][y].unvisited():
-                    for n in get_neighbors(x, y, self.width, self.height):
-                        xn, yn = n
+        2. The grid cell is adjacent to a visited cell.
+
+        Then return a visited neighbor of p, from which 'tour' can
+        resume.
 
-                        if self.grid[xn][yn].visited():
-                            return xn, yn
+        Rather than sweeping the whole grid each time, candidates are
+        popped off 'self.frontier', which 'tour' keeps up to date. Each
+        cell is pushed there at most four times, so the hunt phase
+        costs O(n log n) over the whole of 'carve', instead of O(n) per
+        call.
+
+        """
+        while self.frontier:
+            i = heapq.heappop(self.frontier)
+
+            if self.cells[i]:
+                continue
+
+            x, y = i % self.width, i // self.width
+
+            for xn, yn in get_neighbors(x, y, self.width, self.height):
+                if self.visited(xn, yn):
+                    return xn, yn
 
         return None
 
-    def carve(self) -> None:
+    def carve(self, rng: random.Random | None = None) -> None:
         """Carve the maze path inside this grid.
 
-        This is the public, top-level method of this class."""
+        This is the public, top-level method of this class.
+
+        Random choices are made with 'rng', so that seeding it makes
+        the maze reproducible. If it's not given, a fresh, unseeded
+        generator is used.
+
+        """
+        if rng is None:
+            rng = random.Random()
 
         # Pick a random point from within the grid.
-        x = random.randrange(self.width)
-        y = random.randrange(self.height)
+        x = rng.randrange(self.width)
+        y = rng.randrange(self.height)
 
         while True:
-            self.tour(x, y)
+            self.tour(x, y, rng)
             point = self.scan()
 
             if point is None:
@@ -138,6 +200,38 @@ class Grid:
 
             x, y = point
 
+    def is_perfect(self) -> bool:
+        """Return whether the grid holds a perfect maze, that is, one
+        with exactly one path between any two cells.
+
+        That's the case when the cells are all connected, by one link
+        fewer than there are cells.
+
+        """
+        links = sum(bin(cell).count("1") for cell in self.cells) // 2
+
+        if links != len(self.cells) - 1:
+            return False
+
+        seen = bytearray(len(self.cells))
+        seen[0] = 1
+        stack = [0]
+
+        while stack:
+            i = stack.pop()
+
+            # Cells on the edge never have links pointing out of the
+            # grid, so the neighbor indices below stay in range.
+            for bit, j in [(_UP, i - self.width),
+                           (_DOWN, i + self.width),
+                           (_LEFT, i - 1),
+                           (_RIGHT, i + 1)]:
+                if self.cells[i] & bit and not seen[j]:
+                    seen[j] = 1
+                    stack.append(j)
+
+        return all(seen)
+
     def __repr__(self):
         """Return a string representation of the grid.
 
@@ -151,7 +245,7 @@ class Grid:
             subbuffer = []
 
             for j in range(self.width):
-                cell = self.grid[j][i]
+                cell = self.cell(j, i)
 
                 subbuffer.append(str(cell))
 
@@ -159,8 +253,54 @@ class Grid:
 
         return "\n".join(buffer)
 
+    def strips(self) -> Iterator["Strip"]:
+        """Yield the rows of the grid as strips, from top to bottom."""
+
+        for y in range(self.height):
+            start = y * self.width
+            row = self.cells[start:start + self.width]
+
+            yield Strip(y, row, last=y == self.height - 1)
+
+
+class Strip:
+    """A single, finished row of a maze.
+
+    Strips are what streaming generators yield instead of a whole
+    'Grid', so that a maze of any height can be consumed in O(width)
+    memory. They offer the same 'cell' method as 'Grid', so that
+    'compute_pillar_position' works on either.
+
+    Fields:
+
+    y: The row of the maze this strip corresponds to.
+
+    cells: The direction bits of each cell in the row, as in
+    'Grid.cells'.
+
+    last: Whether this is the bottom row of the maze.
+
+    """
+    def __init__(self, y: int, cells: bytearray, last: bool = False):
+        self.y = y
+        self.cells = cells
+        self.width = len(cells)
+        self.last = last
+
+    def cell(self, x, y) -> Cell:
+        """Return the cell at (x, y) as a 'Cell' flag.
+
+        'y' must be the row of this strip.
 
-def compute_pillar_position(grid: Grid, x: int, y: int) -> list[Point]:
+        """
+        assert y == self.y, f"Row {y} isn't part of strip {self.y}"
+
+        return Cell(self.cells[x])
+
+
+def compute_pillar_position(grid: Grid | Strip,
+                            x: int,
+                            y: int) -> list[Point]:
     """Determine where pillars will be drawn on the board based on a
     given cell.
 
@@ -174,7 +314,7 @@ def compute_pillar_position(grid: Grid, x: int, y: int) -> list[Point]:
 
     # Compute the _inverse_ of a cell, that is, compute which sides
     # should be closed off by pillars.
-    cell = ~grid.grid[x][y]
+    cell = ~grid.cell(x, y)
 
     # In the final map, each square is conceived of as a 2x2 empty
     # area, surrounded by a border one tile thick. The area altogether
@@ -209,6 +349,187 @@ def compute_pillar_position(grid: Grid, x: int, y: int) -> list[Point]:
     return targets
 
 
+def compute_strip_tile_rows(strip: Strip) -> range:
+    """Return the rows of level tiles that a strip is responsible for.
+
+    Neighboring maze rows share the line of tiles between them, so each
+    strip only claims the top three of its four lines of tiles. The
+    bottom line is claimed only by the last strip. This way, strips can
+    be turned into tiles one at a time without producing anything
+    twice.
+
+    """
+    top = 3 * strip.y
+
+    return range(top, top + 4 if strip.last else top + 3)
+
+
+class Tile(IntEnum):
+    """The kinds of tile a level is made up of."""
+    FLOOR = 0
+    PILLAR = 1
+    STAIRS_UP = 2
+
+
+def _closed_table(direction: Cell) -> bytes:
+    """Return a translation table mapping each possible cell byte to
+    PILLAR if 'direction' is closed in it, and to FLOOR otherwise."""
+
+    return bytes(Tile.FLOOR if i & direction.value else Tile.PILLAR
+                 for i in range(256))
+
+
+_UP_CLOSED = _closed_table(Cell.UP)
+_DOWN_CLOSED = _closed_table(Cell.DOWN)
+_LEFT_CLOSED = _closed_table(Cell.LEFT)
+_RIGHT_CLOSED = _closed_table(Cell.RIGHT)
+
+
+class TileMap:
+    """A dense, rasterized level (or a rectangular part of one.)
+
+    Fields:
+
+    width, height: The size of the map, in tiles.
+
+    tiles: One 'Tile' code per tile, laid out row by row.
+
+    top, left: The row and column of the level that the top left tile
+    of the map corresponds to.
+
+    """
+    def __init__(self,
+                 width: int,
+                 height: int,
+                 tiles: bytearray,
+                 top=0,
+                 left=0):
+        self.width = width
+        self.height = height
+        self.tiles = tiles
+        self.top = top
+        self.left = left
+
+    def positions(self, tile: Tile) -> list[Point]:
+        """Return the level coordinates of every tile of the given
+        kind."""
+
+        width, top, left = self.width, self.top, self.left
+
+        return [(i % width + left, i // width + top)
+                for i, t in enumerate(self.tiles)
+                if t == tile]
+
+    def crop(self, left: int, top: int, width: int, height: int) -> "TileMap":
+        """Return the part of the map with the given bounds, in level
+        coordinates, as a map of its own.
+
+        The bounds are clipped to those of this map.
+
+        """
+        x_min = max(left, self.left)
+        y_min = max(top, self.top)
+        x_max = min(left + width, self.left + self.width)
+        y_max = min(top + height, self.top + self.height)
+
+        tiles = bytearray()
+
+        for y in range(y_min, y_max):
+            start = (y - self.top) * self.width - self.left
+
+            tiles += self.tiles[start + x_min:start + x_max]
+
+        return TileMap(max(x_max - x_min, 0),
+                       max(y_max - y_min, 0),
+                       tiles,
+                       y_min,
+                       x_min)
+
+
+def _wall_line(cells: bytearray, table: bytes) -> bytearray:
+    """Return a horizontal line of tiles running along the top or
+    bottom of a row of cells.
+
+    It has pillars at the corners of every cell, and a two-tile wall
+    wherever 'table' says a cell is closed.
+
+    """
+    line = bytearray(3 * len(cells) + 1)
+    line[0::3] = bytes([Tile.PILLAR]) * (len(cells) + 1)
+
+    walls = cells.translate(table)
+    line[1::3] = walls
+    line[2::3] = walls
+
+    return line
+
+
+def rasterize_strip(strip: Strip) -> TileMap:
+    """Turn a strip into the rows of level tiles it's responsible for.
+
+    This produces the same pillars as 'compute_pillar_position' would
+    for every cell in the strip, but works on whole lines of tiles at a
+    time. Each line is filled in by slice assignments of
+    'bytes.translate' results, so the per-cell work happens in C.
+
+    """
+    width = 3 * strip.width + 1
+
+    # The two lines through the middle of the strip have a pillar
+    # wherever a cell is closed to the left or right.
+    middle = bytearray(width)
+    middle[0:1] = strip.cells[0:1].translate(_LEFT_CLOSED)
+    middle[3::3] = strip.cells.translate(_RIGHT_CLOSED)
+
+    tiles = _wall_line(strip.cells, _UP_CLOSED) + middle + middle
+
+    if strip.last:
+        tiles += _wall_line(strip.cells, _DOWN_CLOSED)
+
+        # The stairs go in the far corner of the level.
+        tiles[3 * width - 2] = Tile.STAIRS_UP
+
+    rows = compute_strip_tile_rows(strip)
+
+    return TileMap(width, len(rows), tiles, top=rows.start)
+
+
+def rasterize_level(strips: Iterable[Strip]) -> tuple[bytearray, TileMap]:
+    """Turn the strips of a whole maze into a level tile map, one strip
+    at a time, so that they can be consumed as they're generated.
+
+    Return the maze's cells, row by row, along with the tile map. Both
+    are plain bytes, so they're cheap to send between processes.
+
+    """
+    cells = bytearray()
+    tiles = bytearray()
+    width = 0
+
+    for strip in strips:
+        tile_map = rasterize_strip(strip)
+
+        cells += strip.cells
+        tiles += tile_map.tiles
+        width = tile_map.width
+
+    return cells, TileMap(width, len(tiles) // width if width else 0, tiles)
+
+
+def rasterize(grid: Grid) -> TileMap:
+    """Turn a whole grid into a level tile map.
+
+    See 'rasterize_strip'.
+
+    """
+    tiles = bytearray()
+
+    for strip in grid.strips():
+        tiles += rasterize_strip(strip).tiles
+
+    return TileMap(3 * grid.width + 1, 3 * grid.height + 1, tiles)
+
+
 # Scratch work for sanity-testing.
 if __name__ == "__main__":
     grid = Grid(5, 5)
@@ -0,0 +1,97 @@
+from collections import deque
+import numpy as np
+from maze import Cell, Grid
+from world import Direction
+
+
+class FlowField:
+    """The way to a target cell of a maze, from every cell near it.
+
+    The field is a breadth-first search of the maze graph, outward from
+    the target, up to 'limit' steps away. It only needs rebuilding when
+    the target moves to another cell, and finding the way from any
+    number of cells is then a single array lookup.
+
+    Fields:
+
+    grid: The maze.
+
+    limit: How many steps away from the target the field reaches.
+
+    target: The cell the field leads to, or None before the first call
+    to 'update'.
+
+    distances: The number of steps from each cell to the target, by
+    cell index as in 'Grid.cells', or -1 for cells out of reach.
+
+    directions: The code of the direction to step in from each cell
+    toward the target (see 'Direction.code'), or -1 for the target
+    itself and cells out of reach.
+
+    """
+    def __init__(self, grid: Grid, limit: int):
+        self.grid = grid
+        self.limit = limit
+        self.target: tuple[int, int] | None = None
+
+        self.distances = np.full(len(grid.cells), -1, dtype=np.int32)
+        self.directions = np.full(len(grid.cells), -1, dtype=np.int8)
+
+        # The cells the field currently reaches.
+        self.reached: list[int] = []
+
+    def update(self, x: int, y: int) -> bool:
+        """Lead the field to cell (x, y), rebuilding it if the target
+        changed. Return whether it was rebuilt.
+
+        The cost depends on the number of cells within 'limit' steps of
+        the target, not on the size of the maze.
+
+        """
+        if self.target == (x, y):
+            return False
+
+        self.target = (x, y)
+
+        self.distances[self.reached] = -1
+        self.directions[self.reached] = -1
+
+        cells = self.grid.cells
+        width = self.grid.width
+
+        # For each way out of a cell: the direction bit, the offset of
+        # the cell it leads to, and the direction to come back in.
+        ways = [(Cell.UP.value, -width, Direction.DOWN.code),
+                (Cell.DOWN.value, width, Direction.UP.code),
+                (Cell.LEFT.value, -1, Direction.RIGHT.code),
+                (Cell.RIGHT.value, 1, Direction.LEFT.code)]
+
+        start = y * width + x
+        distances = {start: 0}
+        reached = [start]
+        directions = [-1]
+        queue = deque([start])
+
+        while queue:
+            i = queue.popleft()
+            distance = distances[i] + 1
+
+            if distance > self.limit:
+                continue
+
+            # Links never point out of the grid, so the neighbor
+            # indices stay in range.
+            for bit, offset, back in ways:
+                j = i + offset
+
+                if cells[i] & bit and j not in distances:
+                    distances[j] = distance
+                    reached.append(j)
+                    directions.append(back)
+                    queue.append(j)
+
+        self.reached = reached
+        self.distances[reached] = [distances[i] for i in reached]
+        self.directions[reached] = directions
+
+        return True
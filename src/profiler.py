@@ -0,0 +1,281 @@
+import contextlib
+import cProfile
+import csv
+import json
+import time
+from collections import deque
+from collections.abc import Iterator
+import numpy as np
+import pygame
+
+
+# The percentiles of each phase's time that are reported.
+PERCENTILES = (50, 95, 99)
+
+# The columns of a CSV export: the time each phase of the frame took,
+# and each counter. A phase that didn't run in a frame is left blank.
+COLUMNS = ("events ms", "player ms", "crawlers ms", "chunks ms",
+           "draw ms", "flip ms", "wait ms", "frame ms",
+           "ticks", "crawlers", "sprites drawn", "collision tests")
+
+
+class NullProfiler:
+    """A profiler that measures nothing, used when profiling is off.
+
+    It has the same methods as 'FrameProfiler', each of which does as
+    little as possible, so that the instrumentation in the game loop
+    costs next to nothing.
+
+    """
+    _phase = contextlib.nullcontext()
+
+    def phase(self, name: str) -> contextlib.AbstractContextManager:
+        return self._phase
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def end_frame(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class FrameProfiler:
+    """Time the phases of each frame, count things that happen in it,
+    and keep statistics over the most recent frames.
+
+    Fields:
+
+    window: How many of the most recent frames the statistics cover.
+
+    times: The time each phase took in each recent frame, in seconds,
+    by phase name. The phase "frame" is the whole frame.
+
+    counts: The value of each counter in each recent frame, by name.
+
+    frames: The times, in milliseconds, and counts of each frame. Every
+    frame since the last export is kept if 'keep_frames' is given (see
+    'take_frames'), and only the recent ones otherwise, so that a long
+    session doesn't use up memory.
+
+    capture: The cProfile profile being captured, if any, which is
+    written to 'capture_file' after 'capture_frames' more frames.
+
+    """
+    def __init__(self, window: int = 300, keep_frames: bool = False):
+        self.window = window
+        self.times: dict[str, deque[float]] = {}
+        self.counts: dict[str, deque[int]] = {}
+        self.frames: list[dict[str, float]] | deque[dict[str, float]]
+
+        if keep_frames:
+            self.frames = []
+        else:
+            self.frames = deque(maxlen=window)
+
+        self.frame_times: dict[str, float] = {}
+        self.frame_counts: dict[str, int] = {}
+        self.frame_start = time.perf_counter()
+
+        self.capture: cProfile.Profile | None = None
+        self.capture_frames = 0
+        self.capture_file = ""
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the code run within the context as phase 'name' of the
+        current frame. A phase can be entered more than once per
+        frame; its times add up."""
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.frame_times[name] = self.frame_times.get(name, 0.0) + elapsed
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add 'n' to the counter 'name' for the current frame."""
+
+        self.frame_counts[name] = self.frame_counts.get(name, 0) + n
+
+    def end_frame(self) -> None:
+        """Record the current frame, and start the next one."""
+
+        now = time.perf_counter()
+        self.frame_times["frame"] = now - self.frame_start
+        self.frame_start = now
+
+        row: dict[str, float] = {}
+
+        for name, elapsed in self.frame_times.items():
+            self._recent(self.times, name).append(elapsed)
+            row[f"{name} ms"] = elapsed * 1e3
+
+        for name, n in self.frame_counts.items():
+            self._recent(self.counts, name).append(n)
+            row[name] = n
+
+        self.frames.append(row)
+        self.frame_times = {}
+        self.frame_counts = {}
+
+        if self.capture is not None:
+            self.capture_frames -= 1
+
+            if self.capture_frames <= 0:
+                self.stop_capture()
+
+    def _recent(self, series: dict, name: str) -> deque:
+        if name not in series:
+            series[name] = deque(maxlen=self.window)
+
+        return series[name]
+
+    def start_capture(self, filename: str, frames: int) -> None:
+        """Run cProfile over the next 'frames' frames, and write its
+        statistics to 'filename' (see the 'pstats' module)."""
+
+        self.capture = cProfile.Profile()
+        self.capture_frames = frames
+        self.capture_file = filename
+        self.capture.enable()
+
+    def stop_capture(self) -> None:
+        if self.capture is None:
+            return
+
+        self.capture.disable()
+        self.capture.dump_stats(self.capture_file)
+        self.capture = None
+
+    def percentiles(self, name: str) -> tuple[float, ...]:
+        """Return the percentiles of phase 'name' over the recent
+        frames, in milliseconds."""
+
+        return tuple(np.percentile(self.times[name], PERCENTILES) * 1e3)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Return the statistics of the recent frames: the percentiles
+        of each phase, in milliseconds, and the mean and maximum of
+        each counter."""
+
+        summary: dict[str, dict[str, float]] = {}
+
+        for name in self.times:
+            summary[f"{name} ms"] = {
+                f"p{p}": round(value, 3)
+                for p, value in zip(PERCENTILES, self.percentiles(name))
+            }
+
+        for name, counts in self.counts.items():
+            summary[name] = {"mean": round(float(np.mean(counts)), 1),
+                             "max": int(max(counts))}
+
+        return summary
+
+    def report(self) -> list[str]:
+        """Return the statistics of the recent frames as lines of
+        text."""
+
+        lines = []
+
+        for name, stats in self.summary().items():
+            values = "  ".join(f"{key} {value:g}"
+                               for key, value in stats.items())
+            lines.append(f"{name:<22} {values}")
+
+        return lines
+
+    def take_frames(self) -> list[dict[str, float]]:
+        """Return the frames recorded since the last call, and forget
+        them, e.g. because they're being exported."""
+
+        frames = list(self.frames)
+        self.frames.clear()
+
+        return frames
+
+    def close(self) -> None:
+        """Finish a capture cut short, e.g. by the game ending."""
+
+        self.stop_capture()
+
+
+class Export:
+    """A file the profiler's frames are written to a batch at a time, as
+    they come in, so that each write only costs as much as the frames
+    added since the last one.
+
+    The frames are written as CSV, one row per frame (see 'COLUMNS'),
+    or, if the filename ends in '.jsonl', as JSON lines: an object per
+    frame, and the summary of the last frames once the game is over
+    (see 'finish').
+
+    """
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.json = filename.endswith(".jsonl")
+
+        with open(filename, "w", newline="") as f:
+            if not self.json:
+                csv.writer(f).writerow(COLUMNS)
+
+    def write(self, frames: list[dict[str, float]]) -> None:
+        """Append the times and counts of 'frames' to the file."""
+
+        with open(self.filename, "a", newline="") as f:
+            if self.json:
+                f.writelines(json.dumps(frame) + "\n" for frame in frames)
+            else:
+                csv.DictWriter(f, COLUMNS).writerows(frames)
+
+    def finish(self, summary: dict[str, dict[str, float]]) -> None:
+        """Append 'summary' (see 'FrameProfiler.summary'), as JSON."""
+
+        if self.json:
+            with open(self.filename, "a") as f:
+                f.write(json.dumps({"summary": summary}) + "\n")
+
+
+class Overlay:
+    """The profiler's statistics, drawn over the top left corner of the
+    screen.
+
+    Rendering text is slow, so the text is only rendered again every
+    'interval' frames, and blitted from a cached surface in between.
+
+    """
+    def __init__(self, profiler: FrameProfiler, interval: int = 30):
+        self.profiler = profiler
+        self.interval = interval
+        self.frames = 0
+        self.font = pygame.font.Font(None, 16)
+        self.surface: pygame.Surface | None = None
+
+    def draw(self, screen: pygame.Surface) -> pygame.Rect:
+        """Draw the statistics onto 'screen', and return the area drawn
+        to."""
+
+        if self.surface is None or self.frames % self.interval == 0:
+            lines = [self.font.render(line, True, pygame.Color("white"))
+                     for line in self.profiler.report()]
+
+            width = max((line.get_width() for line in lines), default=0)
+            height = sum(line.get_height() for line in lines)
+
+            self.surface = pygame.Surface((width + 4, height + 4))
+            self.surface.set_alpha(192)
+
+            y = 2
+
+            for line in lines:
+                self.surface.blit(line, (2, y))
+                y += line.get_height()
+
+        self.frames += 1
+
+        return screen.blit(self.surface, (0, 0))
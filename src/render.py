@@ -0,0 +1,380 @@
+import pygame
+from collections import OrderedDict
+import constants as cs
+from collision import colliding
+from profiler import FrameProfiler, NullProfiler, Overlay
+from typedefs import Point
+
+
+def chunk_rect(chunk: Point) -> pygame.Rect:
+    """Return the area of the level covered by 'chunk', in pixels."""
+
+    cx, cy = chunk
+    x, y = cs.compute_pixel_coords(cx * cs.CHUNK_LEN, cy * cs.CHUNK_LEN)
+    size = cs.CHUNK_LEN * cs.LEVEL_FACTOR
+
+    return pygame.Rect(x, y, size, size)
+
+
+def chunks_within(rect: pygame.Rect) -> list[Point]:
+    """Return the chunks overlapping 'rect', in pixels, row by row."""
+
+    if rect.width <= 0 or rect.height <= 0:
+        return []
+
+    x_min, y_min = cs.compute_chunk_coords(
+        *cs.compute_grid_coords(rect.left, rect.top))
+    x_max, y_max = cs.compute_chunk_coords(
+        *cs.compute_grid_coords(rect.right - 1, rect.bottom - 1))
+
+    return [(cx, cy)
+            for cy in range(y_min, y_max + 1)
+            for cx in range(x_min, x_max + 1)]
+
+
+def exposed(old: pygame.Rect, new: pygame.Rect) -> list[pygame.Rect]:
+    """Return the parts of 'new' that 'old' doesn't cover, for two areas
+    of the same size: at most a strip along a side and one along the top
+    or bottom. They can overlap in a corner."""
+
+    strips = []
+
+    if new.left < old.left:
+        strips.append(pygame.Rect(new.left,
+                                  new.top,
+                                  old.left - new.left,
+                                  new.height))
+    elif new.right > old.right:
+        strips.append(pygame.Rect(old.right,
+                                  new.top,
+                                  new.right - old.right,
+                                  new.height))
+
+    if new.top < old.top:
+        strips.append(pygame.Rect(new.left,
+                                  new.top,
+                                  new.width,
+                                  old.top - new.top))
+    elif new.bottom > old.bottom:
+        strips.append(pygame.Rect(new.left,
+                                  old.bottom,
+                                  new.width,
+                                  new.bottom - old.bottom))
+
+    return [strip.clip(new) for strip in strips]
+
+
+def render_chunk(chunk: Point,
+                 sprites: pygame.sprite.AbstractGroup) -> pygame.Surface:
+    """Draw 'sprites', the fixtures of 'chunk', onto a new surface the
+    size of a chunk."""
+
+    area = chunk_rect(chunk)
+
+    surface = pygame.Surface(area.size).convert()
+    surface.fill(pygame.Color("black"))
+    surface.blits([(sprite.image, sprite.rect.move(-area.x, -area.y))
+                   for sprite in sprites],
+                  doreturn=False)
+
+    return surface
+
+
+class Camera:
+    """The part of the level that's on screen.
+
+    Fields:
+
+    rect: The area of the level shown, in pixels. Its size is that of
+    the screen.
+
+    """
+    def __init__(self, width: int, height: int):
+        self.rect = pygame.Rect(0, 0, width, height)
+
+    def follow(self, target: pygame.Rect) -> None:
+        """Center the view on 'target', without going past the edges of
+        the level."""
+
+        level = pygame.Rect((0, 0),
+                            cs.compute_pixel_coords(cs.NUM_TILES_X,
+                                                    cs.NUM_TILES_Y))
+
+        self.rect.center = target.center
+        self.rect = self.rect.clamp(level)
+
+
+class Background:
+    """The static layers of the level, pre-rendered one chunk at a
+    time.
+
+    Drawing the few chunk surfaces in view replaces drawing every floor
+    tile, pillar and so on separately, and the cost of doing so depends
+    on the size of the screen, not that of the level.
+
+    Fields:
+
+    chunks: The fixture sprites of each chunk, in the order they're to
+    be drawn.
+
+    surfaces: The rendered chunks, least recently used first.
+
+    capacity: How many rendered chunks to keep at most.
+
+    view, view_rect: The last area of the level put together by 'get',
+    and where it lies in the level.
+
+    scale_factor: The scale factor the surfaces were rendered at.
+
+    """
+    def __init__(self, capacity: int = 64):
+        self.chunks: dict[Point, pygame.sprite.AbstractGroup] = {}
+        self.surfaces: OrderedDict[Point, pygame.Surface] = OrderedDict()
+        self.capacity = capacity
+        self.view: pygame.Surface | None = None
+        self.view_rect: pygame.Rect | None = None
+        self.scale_factor = cs.SCALE_FACTOR
+
+    def set(self,
+            chunks: dict[Point, pygame.sprite.AbstractGroup],
+            surfaces: dict[Point, pygame.Surface] | None = None) -> None:
+        """Show the level made up of 'chunks', e.g. because a new level
+        was entered.
+
+        Chunks rendered ahead of time can be passed in 'surfaces'.
+
+        """
+        self.invalidate()
+        self.chunks = chunks
+        self.surfaces.update(surfaces or {})
+
+    def invalidate(self) -> None:
+        """Mark every chunk for rendering again."""
+
+        self.surfaces.clear()
+        self.view = None
+        self.scale_factor = cs.SCALE_FACTOR
+
+    def chunk(self, chunk: Point) -> pygame.Surface:
+        """Return the rendered chunk, rendering it first if it isn't
+        cached."""
+
+        if chunk in self.surfaces:
+            self.surfaces.move_to_end(chunk)
+            return self.surfaces[chunk]
+
+        surface = render_chunk(chunk,
+                               self.chunks.get(chunk, pygame.sprite.Group()))
+        self.surfaces[chunk] = surface
+
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+
+        return surface
+
+    def draw(self, rect: pygame.Rect) -> None:
+        """Draw the chunks overlapping 'rect', an area of the level
+        within the view, onto the view."""
+
+        x, y = self.view_rect.topleft
+        self.view.set_clip(rect.move(-x, -y))
+
+        for chunk in chunks_within(rect):
+            self.view.blit(self.chunk(chunk),
+                           chunk_rect(chunk).move(-x, -y))
+
+        self.view.set_clip(None)
+
+    def get(self, rect: pygame.Rect) -> pygame.Surface:
+        """Return the area 'rect' of the level, as a surface.
+
+        The surface is rebuilt from the chunks only if the level, the
+        scale factor or the size of the area changed since the last
+        call, and is the same object as before otherwise. If the area
+        merely moved, the surface is scrolled along with it, and only
+        the strips that came into view are drawn (see 'exposed').
+
+        """
+        if self.scale_factor != cs.SCALE_FACTOR:
+            self.invalidate()
+
+        if (self.view is None
+                or self.view_rect.size != rect.size
+                or not self.view_rect.colliderect(rect)):
+            self.view = pygame.Surface(rect.size).convert()
+            self.view_rect = rect.copy()
+            self.draw(rect)
+        elif self.view_rect != rect:
+            old = self.view_rect
+            self.view.scroll(old.x - rect.x, old.y - rect.y)
+            self.view_rect = rect.copy()
+
+            for strip in exposed(old, rect):
+                self.draw(strip)
+
+        return self.view
+
+
+def draw_sprites(screen: pygame.Surface,
+                 camera: Camera,
+                 groups: list[pygame.sprite.AbstractGroup],
+                 alpha: float = 1.0) -> list[pygame.Rect]:
+    """Draw the sprites of 'groups' that are in view onto 'screen', and
+    return the areas of the screen drawn to.
+
+    Sprites that can be are drawn a fraction 'alpha' of the way between
+    where they were before the last tick and where they are now (see
+    'main.Moving.interpolated_rect').
+
+    """
+
+    # A sprite's image can stick out of its rect a little, so look a
+    # tile past the edges of the screen.
+    margin = 2 * cs.LEVEL_FACTOR
+    x, y = camera.rect.topleft
+
+    drawn: list[pygame.Rect] = []
+
+    for group in groups:
+        for sprite in colliding(camera.rect.inflate(margin, margin), group):
+            if hasattr(sprite, "interpolated_rect"):
+                rect = sprite.interpolated_rect(alpha)
+            else:
+                rect = sprite.rect
+
+            drawn.append(screen.blit(sprite.image, rect.move(-x, -y)))
+
+    return drawn
+
+
+def draw_overlays(screen: pygame.Surface,
+                  overlays: list[Overlay]) -> list[pygame.Rect]:
+    """Draw 'overlays' onto 'screen', over everything else, and return
+    the areas of the screen drawn to."""
+
+    return [overlay.draw(screen) for overlay in overlays]
+
+
+class FullRenderer:
+    """Redraw the whole screen every frame.
+
+    The background in view is blitted over everything, the given sprite
+    groups are drawn on top of it, and the whole display is flipped.
+
+    Fields:
+
+    profiler: Times the drawing and the flip, and counts the sprites
+    drawn.
+
+    overlays: Drawn over everything else, in screen coordinates.
+
+    """
+    def __init__(self,
+                 background: Background,
+                 profiler: FrameProfiler | NullProfiler = NullProfiler(),
+                 overlays: list[Overlay] | None = None):
+        self.background = background
+        self.profiler = profiler
+        self.overlays = overlays or []
+
+    def render(self,
+               screen: pygame.Surface,
+               camera: Camera,
+               groups: list[pygame.sprite.AbstractGroup],
+               alpha: float = 1.0) -> None:
+        with self.profiler.phase("draw"):
+            # Important: this prevents moving, animated sprites from
+            # leaving streaks.
+            screen.blit(self.background.get(camera.rect), (0, 0))
+
+            drawn = draw_sprites(screen, camera, groups, alpha)
+            draw_overlays(screen, self.overlays)
+
+        self.profiler.count("sprites drawn", len(drawn))
+
+        with self.profiler.phase("flip"):
+            pygame.display.flip()
+
+
+class DirtyRenderer:
+    """Only redraw the parts of the screen where sprites were or are.
+
+    Each frame, the background is restored wherever sprites were last
+    drawn (including sprites that have since been removed), the sprites
+    in view are drawn again, and only those areas of the display are
+    updated.
+
+    When the camera moves, what's on the screen is scrolled along with
+    it, and the background is only drawn onto the strips that came into
+    view. Since every pixel on the display then changed, the whole
+    display is still updated.
+
+    Fields:
+
+    drawn_background, drawn_rect: The background surface that's
+    currently on the screen, and the area of the level it showed when it
+    was drawn. When the background changes, e.g. because a new level
+    was entered, the whole screen is redrawn once.
+
+    drawn: The areas of the screen sprites and overlays were drawn to
+    last frame.
+
+    profiler, overlays: As for 'FullRenderer'.
+
+    """
+    def __init__(self,
+                 background: Background,
+                 profiler: FrameProfiler | NullProfiler = NullProfiler(),
+                 overlays: list[Overlay] | None = None):
+        self.background = background
+        self.profiler = profiler
+        self.overlays = overlays or []
+        self.drawn_background: pygame.Surface | None = None
+        self.drawn_rect: pygame.Rect | None = None
+        self.drawn: list[pygame.Rect] = []
+
+    def render(self,
+               screen: pygame.Surface,
+               camera: Camera,
+               groups: list[pygame.sprite.AbstractGroup],
+               alpha: float = 1.0) -> None:
+        with self.profiler.phase("draw"):
+            background = self.background.get(camera.rect)
+            full = background is not self.drawn_background
+            scrolled = not full and camera.rect != self.drawn_rect
+
+            if full:
+                screen.blit(background, (0, 0))
+                self.drawn_background = background
+            else:
+                dx = self.drawn_rect.x - camera.rect.x
+                dy = self.drawn_rect.y - camera.rect.y
+                x, y = camera.rect.topleft
+
+                if scrolled:
+                    screen.scroll(dx, dy)
+
+                    for strip in exposed(self.drawn_rect, camera.rect):
+                        strip.move_ip(-x, -y)
+                        screen.blit(background, strip, strip)
+
+                # Whatever was drawn last frame was scrolled along with
+                # the rest of the screen.
+                for rect in self.drawn:
+                    rect = rect.move(dx, dy)
+                    screen.blit(background, rect, rect)
+
+            self.drawn_rect = camera.rect.copy()
+
+            sprites = draw_sprites(screen, camera, groups, alpha)
+            drawn = sprites + draw_overlays(screen, self.overlays)
+
+        self.profiler.count("sprites drawn", len(sprites))
+
+        with self.profiler.phase("flip"):
+            if full or scrolled:
+                pygame.display.flip()
+            else:
+                pygame.display.update(self.drawn + drawn)
+
+        self.drawn = drawn
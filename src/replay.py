@@ -0,0 +1,146 @@
+import struct
+from collections.abc import Iterator
+
+
+# The header: a magic number, the format version, the number of levels,
+# the seed, the length of a tick in seconds, the maze size in cells,
+# the scale factor and the name of the maze generator, all
+# little-endian.
+HEADER = struct.Struct("<4sBHQdIIH32s")
+MAGIC = b"LIDR"
+VERSION = 2
+
+# A run of ticks with the same keys pressed: the key mask (see
+# 'controls.Pressed') and the number of ticks.
+RUN = struct.Struct("<BH")
+
+# The footer: the number of ticks the game ran for, and the digest of
+# the game's state at the end.
+FOOTER = struct.Struct("<Q16s")
+
+
+def _runs(masks: list[int]) -> Iterator[tuple[int, int]]:
+    """Yield (mask, ticks) for each run of equal masks, splitting runs
+    too long to store."""
+
+    limit = (1 << 16) - 1
+    start = 0
+
+    while start < len(masks):
+        mask = masks[start]
+        end = start + 1
+
+        while (end < len(masks) and masks[end] == mask
+               and end - start < limit):
+            end += 1
+
+        yield mask, end - start
+        start = end
+
+
+class Replay:
+    """A record of a game, from which it can be played again exactly as
+    it went.
+
+    A game is deterministic given its settings and seed, and the keys
+    pressed on each tick, so those are all that's kept. Keys are stored
+    as runs of identical key masks, which takes a few bytes per key
+    press rather than per tick.
+
+    Fields:
+
+    seed: Seeds the mazes and every level's world.
+
+    dt: The length of a tick, in seconds.
+
+    width, height: The size of each level's maze, in cells.
+
+    levels, scale_factor, algorithm: The game's settings, as
+    given on the command line.
+
+    masks: The key mask the player read on each tick.
+
+    ticks: The number of ticks the game ran for.
+
+    digest: The digest of the game's state when it ended (see
+    'main.state_digest'), or None if it hasn't yet, as when the game
+    was saved partway through (see 'services.autosave').
+
+    """
+    def __init__(self,
+                 seed: int,
+                 dt: float,
+                 width: int,
+                 height: int,
+                 levels: int,
+                 scale_factor: int,
+                 algorithm: str):
+        self.seed = seed
+        self.dt = dt
+        self.width = width
+        self.height = height
+        self.levels = levels
+        self.scale_factor = scale_factor
+        self.algorithm = algorithm
+        self.masks: list[int] = []
+        self.ticks = 0
+        self.digest: bytes | None = None
+
+    def save(self, filename: str) -> None:
+        with open(filename, "wb") as f:
+            f.write(HEADER.pack(MAGIC,
+                                VERSION,
+                                self.levels,
+                                self.seed,
+                                self.dt,
+                                self.width,
+                                self.height,
+                                self.scale_factor,
+                                self.algorithm.encode()))
+
+            for mask, ticks in _runs(self.masks):
+                f.write(RUN.pack(mask, ticks))
+
+            f.write(FOOTER.pack(self.ticks, self.digest or bytes(16)))
+
+    @classmethod
+    def load(cls, filename: str) -> "Replay":
+        with open(filename, "rb") as f:
+            data = f.read()
+
+        if len(data) < HEADER.size + FOOTER.size:
+            raise ValueError(f"{filename} is too short to be a replay")
+
+        (magic, version, levels, seed, dt, width, height,
+         scale_factor, algorithm) = HEADER.unpack_from(data)
+
+        if magic != MAGIC:
+            raise ValueError(f"{filename} isn't a replay")
+
+        if version != VERSION:
+            raise ValueError(f"{filename} has unsupported version "
+                             f"{version}")
+
+        body = data[HEADER.size:len(data) - FOOTER.size]
+
+        if len(body) % RUN.size:
+            raise ValueError(f"{filename} is truncated")
+
+        replay = cls(seed,
+                     dt,
+                     width,
+                     height,
+                     levels,
+                     scale_factor,
+                     algorithm.rstrip(b"\0").decode())
+
+        for mask, ticks in RUN.iter_unpack(body):
+            replay.masks.extend([mask] * ticks)
+
+        replay.ticks, digest = FOOTER.unpack_from(data, len(data)
+                                                  - FOOTER.size)
+
+        if any(digest):
+            replay.digest = digest
+
+        return replay
@@ -0,0 +1,65 @@
+import asyncio
+import copy
+from collections.abc import Callable
+from profiler import Export, FrameProfiler
+from replay import Replay
+
+
+# How often the services write out what they have so far, in seconds.
+INTERVAL = 5.0
+
+
+async def in_background(write: Callable[..., None], *args) -> None:
+    """Call 'write' with 'args' on a worker thread, so that the frame
+    loop doesn't wait for the disk.
+
+    If the service calling this is cancelled, e.g. because the game
+    ended, the write is still finished before the cancellation goes
+    through, so that it can't overwrite whatever's written after the
+    game.
+
+    """
+    task = asyncio.ensure_future(asyncio.to_thread(write, *args))
+
+    try:
+        await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await task
+        raise
+
+
+async def autosave(replay: Replay,
+                   filename: str,
+                   interval: float = INTERVAL) -> None:
+    """Save the game recorded so far to 'filename' every 'interval'
+    seconds, so that it isn't lost if the game crashes.
+
+    Such a recording has no digest, since the game hadn't ended (see
+    'Replay.digest'), but it can still be replayed up to where it was
+    cut short.
+
+    """
+    while True:
+        await asyncio.sleep(interval)
+
+        # The keys are copied here, since the game goes on recording
+        # them while the copy is written.
+        snapshot = copy.copy(replay)
+        snapshot.masks = list(replay.masks)
+        snapshot.ticks = len(snapshot.masks)
+        snapshot.digest = None
+
+        await in_background(snapshot.save, filename)
+
+
+async def export_telemetry(profiler: FrameProfiler,
+                           export: Export,
+                           interval: float = INTERVAL) -> None:
+    """Write the profiler's frames since the last time to 'export' every
+    'interval' seconds, so that the cost of each write doesn't grow with
+    the length of the game."""
+
+    while True:
+        await asyncio.sleep(interval)
+
+        await in_background(export.write, profiler.take_frames())
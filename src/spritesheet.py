@@ -12,9 +12,14 @@ class Spritesheet:
     sheet: The image corresponding to the sprite sheet. This is loaded
     once upon initialization.
 
+    cache: The scaled surface of every tile fetched so far, keyed by
+    tile def and scale factor. Sprites showing the same tile share the
+    same surface, so they must not draw onto it.
+
     """
     def __init__(self, filename):
         self.sheet = pygame.image.load(filename).convert()
+        self.cache: dict[tuple[TileDef, int], pygame.Surface] = {}
 
     def get(self, tile_def: TileDef) -> pygame.Surface:
         """Fetch a single, discrete, tile from 'self.sheet'.
@@ -24,7 +29,28 @@ class Spritesheet:
         It's assumed that each tile is a square of 'size'x'size'
         pixels inside the spritesheet.
 
+        Each tile is only cut out and scaled once per scale factor;
+        later calls return the cached surface.
+
         """
+        key = (tile_def, cs.SCALE_FACTOR)
+
+        if key not in self.cache:
+            # Surfaces scaled by some other factor are of no further
+            # use, since the scale factor is configured once for the
+            # whole display.
+            for old_key in list(self.cache):
+                if old_key[1] != cs.SCALE_FACTOR:
+                    del self.cache[old_key]
+
+            self.cache[key] = self.load(tile_def)
+
+        return self.cache[key]
+
+    def load(self, tile_def: TileDef) -> pygame.Surface:
+        """Cut out and scale a single tile from 'self.sheet', bypassing
+        the cache."""
+
         tile_data = tile_def.value
         x_tile, y_tile = tile_data[0]
         color_key = tile_data[1]
@@ -0,0 +1,738 @@
+from enum import Enum, IntEnum
+import numpy as np
+import pygame
+from pygame.math import Vector2
+
+
+class Direction(Enum):
+    """An enum for using vectors as hashmap keys.
+
+    In a World, a direction is stored as its position in this enum
+    (see 'Direction.code' and 'DIRECTIONS').
+
+    """
+    UP = Vector2(0, -1)
+    DOWN = Vector2(0, 1)
+    LEFT = Vector2(-1, 0)
+    RIGHT = Vector2(1, 0)
+
+    @property
+    def code(self) -> int:
+        return DIRECTIONS.index(self)
+
+
+DIRECTIONS = list(Direction)
+
+# The unit vector of each direction, indexed by direction code.
+DIRECTION_VECTORS = np.array([[d.value.x, d.value.y] for d in DIRECTIONS])
+
+
+class Kind(IntEnum):
+    """The kinds of entity a World keeps track of."""
+    PLAYER = 0
+    CRAWLER = 1
+
+
+# A batch of rects, as arrays of x, y, width and height.
+type Rects = tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+# The state of an entity taken out of play, packed into 17 bytes. The
+# entity's kind, size, speed and cooldown aren't stored, since they're
+# the same for every entity of a kind.
+RECORD = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("direction", np.int8),
+    ("timer", np.float32),
+    ("animation", np.float32),
+])
+
+
+def overlap_pairs(a: Rects, b: Rects) -> tuple[np.ndarray, np.ndarray]:
+    """Return every pair (i, j) such that rect a[i] overlaps rect b[j],
+    as a pair of index arrays.
+
+    Overlapping means the same thing as for pygame.Rect.colliderect.
+
+    Rects of 'b' outside the bounding box of all of 'a' are dropped
+    first, which leaves few of them when the rects of 'a' are close
+    together, as when only the crawlers near the player are stepped.
+
+    Small batches are then compared all against all. Larger ones are
+    first binned into a grid by their top left corners, with cells as
+    big as the biggest rect, so that a rect can only overlap rects in
+    the same cell as it or in one of the eight cells around it. Finding
+    the candidates in those cells takes a sort and a few binary
+    searches, so the cost grows as O(n log n) rather than O(n^2).
+
+    """
+    if len(a[0]) == 0 or len(b[0]) == 0:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.intp)
+
+    left, top = a[0].min(), a[1].min()
+    right, bottom = (a[0] + a[2]).max(), (a[1] + a[3]).max()
+
+    keep = np.flatnonzero(_overlapping(left, top, right - left, bottom - top,
+                                       *b))
+    i, j = _overlap_pairs(a, tuple(v[keep] for v in b))
+
+    return i, keep[j]
+
+
+def _overlap_pairs(a: Rects, b: Rects) -> tuple[np.ndarray, np.ndarray]:
+    if len(a[0]) * len(b[0]) <= 1 << 16:
+        ax, ay, aw, ah = (v[:, np.newaxis] for v in a)
+        bx, by, bw, bh = b
+
+        return np.nonzero(_overlapping(ax, ay, aw, ah, bx, by, bw, bh))
+
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+
+    size = max(int(aw.max()), int(ah.max()), int(bw.max()), int(bh.max()), 1)
+
+    a_cx, a_cy = ax // size, ay // size
+    b_cx, b_cy = bx // size, by // size
+
+    # Number the cells so that the cells around any cell in use also
+    # get nonnegative numbers, unique within each row of cells.
+    x_min = min(a_cx.min(), b_cx.min()) - 1
+    y_min = min(a_cy.min(), b_cy.min()) - 1
+    rows = int(max(a_cy.max(), b_cy.max()) - y_min) + 2
+    columns = int(max(a_cx.max(), b_cx.max()) - x_min) + 2
+
+    a_cells = (a_cx - x_min).astype(np.int64) * rows + (a_cy - y_min)
+    b_cells = (b_cx - x_min).astype(np.int64) * rows + (b_cy - y_min)
+
+    order = np.argsort(b_cells, kind="stable")
+    sorted_cells = b_cells[order]
+
+    # Where each cell's rects start within 'order', and how many there
+    # are. If there are enough rects to look up for the number of
+    # cells, these are looked up in a table with an entry for every
+    # cell; otherwise they're found by binary search.
+    if columns * rows <= 32 * len(ax) + 4096:
+        table_counts = np.bincount(b_cells, minlength=columns * rows)
+        table_starts = np.cumsum(table_counts) - table_counts
+
+        def cell_ranges(cells):
+            return table_starts[cells], table_counts[cells]
+    else:
+        def cell_ranges(cells):
+            start = np.searchsorted(sorted_cells, cells, side="left")
+            end = np.searchsorted(sorted_cells, cells, side="right")
+
+            return start, end - start
+
+    candidates_i = []
+    candidates_j = []
+
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            start, counts = cell_ranges(a_cells + dx * rows + dy)
+
+            # Expand each rect of 'a' into one candidate pair per rect of
+            # 'b' in the target cell.
+            i = np.repeat(np.arange(len(ax)), counts)
+            offsets = np.arange(len(i)) - np.repeat(np.cumsum(counts)
+                                                    - counts, counts)
+
+            candidates_i.append(i)
+            candidates_j.append(order[np.repeat(start, counts) + offsets])
+
+    i = np.concatenate(candidates_i)
+    j = np.concatenate(candidates_j)
+
+    hit = _overlapping(ax[i], ay[i], aw[i], ah[i], bx[j], by[j], bw[j], bh[j])
+
+    return i[hit], j[hit]
+
+
+def _overlapping(ax, ay, aw, ah, bx, by, bw, bh) -> np.ndarray:
+    return (ax < bx + bw) & (bx < ax + aw) & (ay < by + bh) & (by < ay + ah)
+
+
+class World:
+    """The simulation state of every moving entity in the level, kept
+    in struct-of-arrays form.
+
+    Each entity is a slot index into the arrays below. Sprites only
+    hold on to their slot index, so that whole populations of entities
+    can be stepped with a few array operations instead of one method
+    call per sprite. The slots of entities taken out of play are
+    released, and reused by later entities.
+
+    Fields:
+
+    count: The number of slots used so far.
+
+    released: The slots below 'count' that are free for reuse.
+
+    kind: The Kind of each entity.
+
+    x, y, width, height: The rect of each entity, in pixels.
+
+    previous_x, previous_y: Where each entity was before the last tick,
+    so that it can be drawn between there and where it is now (see
+    'snapshot').
+
+    direction: The code of the direction each entity faces.
+
+    timer, cooldown: Each entity's countdown timer, and the value it
+    gets reset to, in seconds.
+
+    speed: Each entity's speed, in pixels per second.
+
+    animation: Each entity's position within its animation, as a
+    fractional frame index.
+
+    alive: Whether each entity is still in play.
+
+    stepped: The tick each entity was last stepped on, for entities
+    that aren't stepped every tick (see 'main.Crawler.update_all').
+
+    tick: The number of ticks the world has been stepped for.
+
+    rng: The source of randomness for entity behavior, seeded with
+    'seed' if given.
+
+    """
+    FIELDS = {
+        "kind": np.int8,
+        "x": np.int32,
+        "y": np.int32,
+        "width": np.int32,
+        "height": np.int32,
+        "previous_x": np.int32,
+        "previous_y": np.int32,
+        "direction": np.int8,
+        "timer": np.float64,
+        "cooldown": np.float64,
+        "speed": np.float64,
+        "animation": np.float64,
+        "alive": np.bool_,
+        "stepped": np.int64,
+    }
+
+    def __init__(self,
+                 capacity: int = 64,
+                 seed: int | list[int] | None = None):
+        self.rng = np.random.default_rng(seed)
+        self.reset(capacity)
+
+    def reset(self, capacity: int = 64) -> None:
+        """Remove every entity."""
+
+        self.count = 0
+        self.released: list[int] = []
+        self.tick = 0
+
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def spawn(self, kind: Kind, rect: pygame.Rect) -> int:
+        """Add a new, living entity with the given rect, and return its
+        slot index."""
+
+        if self.released:
+            i = self.released.pop()
+        else:
+            if self.count == len(self.kind):
+                self.grow(2 * self.count)
+
+            i = self.count
+            self.count += 1
+
+        self.kind[i] = kind
+        self.x[i], self.y[i] = rect.x, rect.y
+        self.previous_x[i], self.previous_y[i] = rect.x, rect.y
+        self.width[i], self.height[i] = rect.width, rect.height
+        self.direction[i] = 0
+        self.timer[i] = 0
+        self.cooldown[i] = 0
+        self.speed[i] = 0
+        self.animation[i] = 0
+        self.alive[i] = True
+        self.stepped[i] = self.tick
+
+        return i
+
+    def release(self, i: int) -> None:
+        """Take an entity out of play, freeing its slot for reuse."""
+
+        if self.alive[i]:
+            self.alive[i] = False
+            self.released.append(i)
+
+    def pack(self, indices: np.ndarray) -> np.ndarray:
+        """Return the state of the given entities as an array of
+        RECORD."""
+
+        records = np.empty(len(indices), dtype=RECORD)
+
+        for name in RECORD.names:
+            records[name] = getattr(self, name)[indices]
+
+        return records
+
+    def unpack(self, i: int, record: np.void) -> None:
+        """Restore the state of an entity from a RECORD."""
+
+        for name in RECORD.names:
+            getattr(self, name)[i] = record[name]
+
+        self.previous_x[i], self.previous_y[i] = record["x"], record["y"]
+        self.stepped[i] = self.tick
+
+    def grow(self, capacity: int) -> None:
+        for name, dtype in self.FIELDS.items():
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=dtype)
+            new[:self.count] = old[:self.count]
+
+            setattr(self, name, new)
+
+    def snapshot(self) -> None:
+        """Remember where every entity is, before a tick moves them."""
+
+        self.previous_x[:self.count] = self.x[:self.count]
+        self.previous_y[:self.count] = self.y[:self.count]
+
+    def interpolated_rect(self, i: int, alpha: float) -> pygame.Rect:
+        """Return the rect of an entity a fraction 'alpha' of the way
+        from where it was before the last tick to where it is now."""
+
+        rect = self.rect(i)
+        rect.x = round(self.previous_x[i] + (rect.x - self.previous_x[i])
+                       * alpha)
+        rect.y = round(self.previous_y[i] + (rect.y - self.previous_y[i])
+                       * alpha)
+
+        return rect
+
+    def indices(self, kind: Kind) -> np.ndarray:
+        """Return the slot indices of every living entity of the given
+        kind, in the order they were spawned."""
+
+        n = self.count
+
+        return np.flatnonzero(self.alive[:n] & (self.kind[:n] == kind))
+
+    def rects(self, indices: np.ndarray) -> Rects:
+        """Return the rects of the given entities, as arrays."""
+
+        return (self.x[indices],
+                self.y[indices],
+                self.width[indices],
+                self.height[indices])
+
+    def rect(self, i: int) -> pygame.Rect:
+        return pygame.Rect(int(self.x[i]),
+                           int(self.y[i]),
+                           int(self.width[i]),
+                           int(self.height[i]))
+
+    def displacements(self,
+                      indices: np.ndarray,
+                      dt: float | np.ndarray) -> np.ndarray:
+        """Return how far each of the given entities would move in 'dt'
+        seconds, in the direction it's facing, as an array of (dx, dy)
+        rows. 'dt' can also be an array, with one time per entity.
+
+        These are in fractional pixels. Moving a rect by them truncates
+        them toward zero, as moving a pygame.Rect by a float would.
+
+        """
+        vectors = DIRECTION_VECTORS[self.direction[indices]]
+        speeds = self.speed[indices, np.newaxis]
+
+        return vectors * speeds * np.asarray(dt)[..., np.newaxis]
+
+    def animate(self,
+                indices: np.ndarray,
+                dt: float | np.ndarray,
+                speed: float,
+                frames: int) -> None:
+        """Advance the animation of the given entities, looping back to
+        the first frame after the last."""
+
+        animation = self.animation[indices] + speed * dt
+        animation[animation >= frames] = 0
+
+        self.animation[indices] = animation
+
+
+class BinIndex:
+    """The entities of some world slots, binned by where they are, so
+    that finding the ones near a rect only looks at a few bins.
+
+    The bins are squares as big as the biggest entity, so an entity can
+    only overlap a rect of at most that size if their top left corners
+    are in the same bin or neighboring ones.
+
+    The index is kept up to date as entities move, come and go (see
+    'move' and 'place'), which only costs anything for the entities
+    that changed bins. It only has to be built again when an entity
+    leaves the area the bins cover, or is too big for them.
+
+    Fields:
+
+    slots: The world slots of the entities, sorted by bin, and by slot
+    within a bin.
+
+    keys: The bin of each of 'slots', numbered row by row.
+
+    bin_of: The bin of the entity at each world slot, or -1 for slots
+    not in the index.
+
+    size: The side of a bin, in pixels.
+
+    columns, rows: The number of bins in a row, and of rows of bins.
+    They cover a few bins more than the entities did when the index was
+    built, so that entities can wander a little before it has to be
+    built again.
+
+    starts: Where each bin's entities start within 'slots', with an
+    extra entry at the end, or None if there are too many bins for the
+    number of entities, in which case they're found by binary search.
+
+    """
+    # How many bins past the entities the index covers, to the right
+    # and below.
+    MARGIN = 4
+
+    def __init__(self, world: "World", slots: np.ndarray):
+        x, y, width, height = world.rects(slots)
+
+        self.size = max(int(width.max(initial=0)),
+                        int(height.max(initial=0)),
+                        1)
+        self.columns = int((x // self.size).max(initial=0)) + 1 + self.MARGIN
+        self.rows = int((y // self.size).max(initial=0)) + 1 + self.MARGIN
+
+        keys = (y // self.size).astype(np.int64) * self.columns \
+            + x // self.size
+        order = np.argsort(keys, kind="stable")
+
+        self.slots = slots[order]
+        self.keys = keys[order]
+        self.bin_of = np.full(len(world.kind), -1, dtype=np.int64)
+        self.bin_of[self.slots] = self.keys
+        self.starts: np.ndarray | None = None
+
+        bins = self.columns * self.rows
+
+        if bins <= 32 * len(slots) + 4096:
+            self.starts = np.zeros(bins + 1, dtype=np.intp)
+            np.cumsum(np.bincount(self.keys, minlength=bins),
+                      out=self.starts[1:])
+
+    def locate(self, world: "World", slots: np.ndarray) -> np.ndarray | None:
+        """Return the bins of the entities at 'slots', or None if any of
+        them is out of the area the bins cover, or too big for them."""
+
+        x, y, width, height = world.rects(slots)
+
+        if len(slots) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        column, row = x // self.size, y // self.size
+
+        if (max(width.max(), height.max()) > self.size
+                or column.min() < 0 or column.max() >= self.columns
+                or row.min() < 0 or row.max() >= self.rows):
+            return None
+
+        return row.astype(np.int64) * self.columns + column
+
+    def move(self, world: "World", slots: np.ndarray) -> bool:
+        """Rebin the entities at 'slots', which moved, and return
+        whether they could be, or the index has to be built again."""
+
+        keys = self.locate(world, slots)
+
+        if keys is None:
+            return False
+
+        changed = keys != self.bin_of[slots]
+        self.place(slots[changed], keys[changed])
+
+        return True
+
+    def place(self, slots: np.ndarray, keys: np.ndarray) -> None:
+        """Put the entities at 'slots' in the bins 'keys', taking them
+        out of the bins they were in, if any. A key of -1 takes an
+        entity out of the index.
+
+        All it takes is a pass over the index, to take out and insert
+        entries, and one over the bins between the first and the last
+        that changed, for 'starts'.
+
+        """
+        if len(slots) == 0:
+            return
+
+        if slots.max() >= len(self.bin_of):
+            self.bin_of = np.pad(self.bin_of,
+                                 (0, slots.max() + 1 - len(self.bin_of)),
+                                 constant_values=-1)
+
+        old = self.bin_of[slots]
+        old = old[old >= 0]
+        taken = np.zeros(len(self.bin_of), dtype=np.bool_)
+        taken[slots] = True
+        kept = ~taken[self.slots]
+
+        inside = keys >= 0
+        new_slots, new_keys = slots[inside], keys[inside]
+        order = np.lexsort((new_slots, new_keys))
+        new_slots, new_keys = new_slots[order], new_keys[order]
+
+        # Entries are ordered by bin, then by slot, whatever order they
+        # were put in.
+        slots_kept, keys_kept = self.slots[kept], self.keys[kept]
+        at = np.searchsorted(keys_kept << 32 | slots_kept,
+                             new_keys << 32 | new_slots)
+
+        self.slots = np.insert(slots_kept, at, new_slots)
+        self.keys = np.insert(keys_kept, at, new_keys)
+        self.bin_of[slots] = keys
+
+        if self.starts is not None and (len(new_keys) or len(old)):
+            # Only the bins from the first to the last one that changed
+            # shift by different amounts; those after them all shift by
+            # the number of entities put in less those taken out.
+            touched = np.concatenate([new_keys, old])
+            first, last = int(touched.min()), int(touched.max()) + 1
+            change = np.cumsum(
+                np.bincount(new_keys - first, minlength=last - first)
+                - np.bincount(old - first, minlength=last - first))
+
+            self.starts[first + 1:last + 1] += change
+            self.starts[last + 1:] += change[-1]
+
+    def ranges(self,
+               first: np.ndarray,
+               last: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return where the entities of bins 'first' through 'last'
+        start and end within 'slots', for each pair of bins."""
+
+        if self.starts is not None:
+            return self.starts[first], self.starts[last + 1]
+
+        return (np.searchsorted(self.keys, first, side="left"),
+                np.searchsorted(self.keys, last, side="right"))
+
+    def near(self, rect: pygame.Rect) -> np.ndarray:
+        """Return the slots of the entities that could overlap 'rect',
+        of any size."""
+
+        if len(self.slots) == 0:
+            return self.slots
+
+        # An entity overlaps the rect only if its top left corner is
+        # less than a bin to the left of or above the rect.
+        left = max((rect.left - self.size) // self.size, 0)
+        right = min((rect.right - 1) // self.size, self.columns - 1)
+        top = max((rect.top - self.size) // self.size, 0)
+        bottom = min((rect.bottom - 1) // self.size, self.rows - 1)
+
+        if left > right or top > bottom:
+            return self.slots[:0]
+
+        rows = np.arange(top, bottom + 1, dtype=np.int64) * self.columns
+        start, end = self.ranges(rows + left, rows + right)
+
+        return self.slots[_ranges(start, end)]
+
+    def pairs(self, rects: Rects) -> tuple[np.ndarray, np.ndarray]:
+        """Return the pairs (i, slot) such that the entity at 'slot'
+        could overlap rects[i], as a pair of arrays.
+
+        The rects must be no bigger than a bin.
+
+        """
+        x, y, _, _ = rects
+
+        # Every rect is looked up in its own bin and the eight around
+        # it, all in one go.
+        column = (x // self.size)[np.newaxis, :] + _NEIGHBORS[0]
+        row = (y // self.size)[np.newaxis, :] + _NEIGHBORS[1]
+        i = np.broadcast_to(np.arange(len(x)), column.shape).ravel()
+        column, row = column.ravel(), row.ravel()
+
+        # Bins past either side would wrap around into the next or
+        # previous row, or be past the ends.
+        outside = ((column < 0) | (column >= self.columns)
+                   | (row < 0) | (row >= self.rows))
+        key = np.where(outside, 0, row.astype(np.int64) * self.columns
+                       + column)
+
+        start, end = self.ranges(key, key)
+
+        # Most bins are empty.
+        full = np.flatnonzero(~outside & (end > start))
+        i, start, end = i[full], start[full], end[full]
+
+        return np.repeat(i, end - start), self.slots[_ranges(start, end)]
+
+
+# The offsets of a bin and the eight around it, in columns and rows.
+_NEIGHBORS = np.array([[dx, dy]
+                       for dx in (-1, 0, 1)
+                       for dy in (-1, 0, 1)]).T[:, :, np.newaxis]
+
+
+def _ranges(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Return the concatenation of the ranges [start[k], end[k])."""
+
+    counts = end - start
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                  counts)
+
+    return np.repeat(start, counts) + offsets
+
+
+class EntityGroup(pygame.sprite.Group):
+    """A group of sprites viewing entities of one kind in a World.
+
+    Collision queries against the group are answered from the world's
+    arrays in one go, rather than sprite by sprite, and only look at
+    the entities near the rects in question (see 'BinIndex').
+
+    Fields:
+
+    by_index: The sprite viewing each of the group's entities, keyed by
+    world slot.
+
+    index: The group's entities binned by where they are, or None if
+    it has to be built again.
+
+    added, removed: The world slots of the entities that joined or left
+    the group since the last query, to be put in or taken out of the
+    index in one go.
+
+    """
+    # Below this many entities, building the index again costs less than
+    # the few dozen array operations it takes to keep it up to date.
+    rebuild_below = 1000
+
+    def __init__(self, world: World, kind: Kind, *sprites):
+        self.world = world
+        self.kind = kind
+        self.by_index: dict[int, pygame.sprite.Sprite] = {}
+        self.index: BinIndex | None = None
+        self.added: set[int] = set()
+        self.removed: set[int] = set()
+
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.by_index[sprite.index] = sprite
+
+        if self.index is not None:
+            self.added.add(sprite.index)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        del self.by_index[sprite.index]
+
+        # An entity that joined since the last query was never indexed.
+        # Its slot may also be a reused one, whose last entity still is.
+        if sprite.index in self.added:
+            self.added.discard(sprite.index)
+        elif self.index is not None:
+            self.removed.add(sprite.index)
+
+        # An entity whose sprite left the group is out of play.
+        self.world.release(sprite.index)
+
+    def moved(self, slots: np.ndarray) -> None:
+        """Note that the entities at 'slots' moved, so that the index
+        follows them."""
+
+        if self.index is None:
+            return
+
+        if (len(self.index.slots) < self.rebuild_below
+                or not self.bins().move(self.world, slots)):
+            self.index = None
+
+    def bins(self) -> BinIndex:
+        if self.index is not None and (self.added or self.removed):
+            removed = np.fromiter(self.removed, dtype=np.int64)
+            added = np.fromiter(self.added, dtype=np.int64)
+            self.added.clear()
+            self.removed.clear()
+
+            self.index.place(removed, np.full(len(removed), -1))
+            keys = self.index.locate(self.world, added)
+
+            if keys is None:
+                self.index = None
+            else:
+                self.index.place(added, keys)
+
+        if self.index is None:
+            self.index = BinIndex(self.world, self.world.indices(self.kind))
+            self.added.clear()
+            self.removed.clear()
+
+        return self.index
+
+    def colliding(self, rect: pygame.Rect) -> list[pygame.sprite.Sprite]:
+        """Return the sprites in the group whose rects collide with
+        'rect'."""
+
+        slots = self.bins().near(rect)
+        x, y, width, height = self.world.rects(slots)
+
+        hit = _overlapping(rect.x, rect.y, rect.width, rect.height,
+                           x, y, width, height)
+
+        return [self.by_index[slot] for slot in slots[hit].tolist()]
+
+    def colliding_many(self,
+                       rects: Rects,
+                       slots: np.ndarray | None = None) -> np.ndarray:
+        """For each of 'rects', return whether it collides with any
+        entity in the group, as an array of bools.
+
+        If the rects are tentative positions of world entities, 'slots'
+        gives their world slots. An entity is then never considered to
+        collide with an entity whose current rect is identical to its
+        own, which includes itself.
+
+        """
+        index = self.bins()
+
+        if (len(rects[0]) > 0
+                and max(rects[2].max(), rects[3].max()) > index.size):
+            # Too big for the bins; this doesn't happen in play.
+            others = self.world.indices(self.kind)
+            i, j = overlap_pairs(rects, self.world.rects(others))
+            b = others[j]
+        else:
+            i, b = index.pairs(rects)
+            x, y, width, height = self.world.rects(b)
+
+            hit = _overlapping(rects[0][i], rects[1][i], rects[2][i],
+                               rects[3][i], x, y, width, height)
+            i, b = i[hit], b[hit]
+
+        if slots is not None:
+            world = self.world
+            a = slots[i]
+
+            same = ((world.x[a] == world.x[b])
+                    & (world.y[a] == world.y[b])
+                    & (world.width[a] == world.width[b])
+                    & (world.height[a] == world.height[b]))
+
+            i = i[~same]
+
+        hit = np.zeros(len(rects[0]), dtype=np.bool_)
+        hit[i] = True
+
+        return hit
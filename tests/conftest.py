@@ -0,0 +1,34 @@
+import os
+import sys
+
+# The game's modules import each other by their bare names, as when
+# running src/main.py directly.
+SRC = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+sys.path.insert(0, SRC)
+
+# Sprite surfaces need a display to be converted for.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+import pytest  # noqa: E402
+
+import constants as cs  # noqa: E402
+import main  # noqa: E402
+from spritesheet import Spritesheet  # noqa: E402
+
+
+@pytest.fixture
+def game():
+    """Set up the display and sprite sheet the game's sprites need, on
+    a 10 by 10 maze."""
+
+    pygame.init()
+    cs.configure_scale_factor(1)
+    cs.configure_grid_size(10, 10)
+    pygame.display.set_mode(cs.compute_view_size())
+    main.sheet = Spritesheet(os.path.join(SRC, "..", "graphics",
+                                          "spritesheet.png"))
+
+    yield main
+
+    pygame.quit()
@@ -0,0 +1,30 @@
+import random
+import pygame
+import constants as cs
+import generators
+import maze
+
+
+def test_one_pillar_sprite_per_pillar_position(game):
+    grid = maze.Grid(cs.GRID_X, cs.GRID_Y)
+    generators.GENERATORS["hunt-and-kill"](grid, random.Random(1))
+
+    level = game.Level.from_strips(grid.strips(), seed=1)
+
+    # Materialize every chunk of the level.
+    level.chunks.update(pygame.Rect((0, 0),
+                                    cs.compute_pixel_coords(cs.NUM_TILES_X,
+                                                            cs.NUM_TILES_Y)))
+
+    pillars = [sprite
+               for fixtures in level.chunks.fixtures.values()
+               for sprite in fixtures
+               if isinstance(sprite, game.Pillar)]
+
+    positions = {position
+                 for y in range(grid.height)
+                 for x in range(grid.width)
+                 for position in maze.compute_pillar_position(grid, x, y)}
+
+    assert len(pillars) == len(positions)
+    assert len({pillar.rect.topleft for pillar in pillars}) == len(pillars)
@@ -0,0 +1,50 @@
+import random
+import pytest
+import generators
+import levelfile
+import maze
+
+
+def carve(width: int, height: int, seed: int) -> maze.Grid:
+    grid = maze.Grid(width, height)
+    generators.GENERATORS["kruskal"](grid, random.Random(seed))
+
+    return grid
+
+
+# An odd width leaves half a byte of padding at the end of each row.
+@pytest.mark.parametrize("width, height", [(12, 7), (13, 5)])
+def test_save_and_load_round_trip(tmp_path, width, height):
+    grid = carve(width, height, seed=3)
+    filename = str(tmp_path / "level.liad")
+
+    levelfile.save(filename, grid.strips(), width, height)
+
+    with levelfile.LevelFile(filename) as level_file:
+        strips = list(level_file.strips())
+
+    assert (level_file.width, level_file.height) == (width, height)
+    assert [strip.y for strip in strips] == list(range(height))
+    assert [strip.last for strip in strips] == [False] * (height - 1) + [True]
+    assert b"".join(strip.cells for strip in strips) == grid.cells
+
+
+@pytest.mark.parametrize("x, y, bit, problem", [
+    # A link out of the top of the maze.
+    (4, 0, maze.Cell.UP, "out of the maze"),
+    # A link out of the right of the maze.
+    (11, 3, maze.Cell.RIGHT, "out of the maze"),
+    # A link into a cell that doesn't link back.
+    (4, 2, maze.Cell.DOWN, "one way"),
+])
+def test_malformed_links_are_rejected(tmp_path, x, y, bit, problem):
+    grid = carve(12, 6, seed=5)
+    filename = str(tmp_path / "level.liad")
+
+    # Flip the bit, so that the cell the link leads to, if any, no
+    # longer agrees with it.
+    grid.cells[y * grid.width + x] ^= bit.value
+    levelfile.save(filename, grid.strips(), grid.width, grid.height)
+
+    with pytest.raises(ValueError, match=problem):
+        levelfile.LevelFile(filename)
@@ -0,0 +1,107 @@
+import numpy as np
+import pygame
+import pytest
+from world import BinIndex, EntityGroup, Kind, World
+
+
+class Entity(pygame.sprite.Sprite):
+    def __init__(self, world: World, rect: pygame.Rect):
+        super().__init__()
+
+        self.index = world.spawn(Kind.CRAWLER, rect)
+
+
+def populate(n: int,
+             seed: int,
+             span: int = 2000) -> tuple[World, EntityGroup]:
+    rng = np.random.default_rng(seed)
+    world = World(seed=seed)
+    group = EntityGroup(world, Kind.CRAWLER)
+
+    for x, y in rng.integers(0, span, size=(n, 2)):
+        group.add(Entity(world, pygame.Rect(int(x), int(y), 11, 11)))
+
+    return world, group
+
+
+@pytest.mark.parametrize("span", [2000, 200000])
+def test_colliding_matches_a_linear_scan(span):
+    # Entities spread far apart are found by binary search rather than
+    # through a table of bins.
+    world, group = populate(2000, 1, span)
+    rng = np.random.default_rng(2)
+
+    for x, y, w, h in rng.integers([-100, -100, 1, 1],
+                                   [span + 100, span + 100, 500, 500],
+                                   size=(200, 4)):
+        rect = pygame.Rect(int(x), int(y), int(w), int(h))
+        expected = {sprite for sprite in group
+                    if rect.colliderect(world.rect(sprite.index))}
+
+        assert set(group.colliding(rect)) == expected
+
+
+def test_colliding_many_matches_a_linear_scan():
+    world, group = populate(2000, 3)
+    rng = np.random.default_rng(4)
+
+    rects = tuple(rng.integers(-20, 2020, size=500) for _ in range(2)) \
+        + (np.full(500, 11), np.full(500, 11))
+    expected = [any(pygame.Rect(int(x), int(y), int(w), int(h)).colliderect(
+                        world.rect(sprite.index))
+                    for sprite in group)
+                for x, y, w, h in zip(*rects)]
+
+    assert group.colliding_many(rects).tolist() == expected
+
+
+def test_index_follows_moves():
+    world, group = populate(100, 5)
+    sprite = next(iter(group))
+    rect = pygame.Rect(5000, 5000, 11, 11)
+
+    assert group.colliding(rect) == []
+
+    world.x[sprite.index], world.y[sprite.index] = rect.topleft
+    group.moved(np.array([sprite.index]))
+
+    assert group.colliding(rect) == [sprite]
+
+
+@pytest.mark.parametrize("span", [2000, 200000])
+def test_index_kept_up_matches_one_built_afresh(span):
+    world, group = populate(500, 6, span)
+    group.rebuild_below = 0
+    rng = np.random.default_rng(7)
+    index = group.bins()
+
+    for _ in range(50):
+        # Some entities take a small step, some leave and some join,
+        # reusing the slots of those that left. They all stay within
+        # the area the index covers, so it's never built again.
+        slots = np.array(sorted(group.by_index))
+        moved = rng.choice(slots, size=100, replace=False)
+        world.x[moved] = np.clip(world.x[moved]
+                                 + rng.integers(-3, 4, size=100), 0, span)
+        world.y[moved] = np.clip(world.y[moved]
+                                 + rng.integers(-3, 4, size=100), 0, span)
+        group.moved(moved)
+
+        for slot in rng.choice(slots, size=5, replace=False).tolist():
+            group.remove(group.by_index[slot])
+
+        for x, y in rng.integers(0, span // 2, size=(5, 2)):
+            group.add(Entity(world, pygame.Rect(int(x), int(y), 11, 11)))
+
+        # Both kinds of change are in before the next query.
+        group.bins()
+
+    assert group.index is index
+
+    fresh = BinIndex(world, world.indices(Kind.CRAWLER))
+
+    assert index.slots.tolist() == fresh.slots.tolist()
+    assert index.keys.tolist() == fresh.keys.tolist()
+
+    if index.starts is not None:
+        assert index.starts.tolist() == fresh.starts.tolist()